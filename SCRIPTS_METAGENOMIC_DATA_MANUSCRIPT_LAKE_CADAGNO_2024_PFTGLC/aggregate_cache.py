@@ -0,0 +1,76 @@
+import hashlib
+import json
+import os
+import pickle
+import time
+
+from master_table_loader import cache_dir_for, file_digest
+
+# Folder (inside the master-table cache) holding the aggregated figures
+AGGREGATE_CACHE_DIR_NAME = "aggregates"
+
+# Eviction limits: total size of the cached aggregates and age since last use
+MAX_CACHE_BYTES = 256 * 1024 ** 2
+MAX_AGE_SECONDS = 30 * 24 * 3600
+
+
+def aggregate_cache_dir(file_path):
+    return os.path.join(cache_dir_for(file_path), AGGREGATE_CACHE_DIR_NAME)
+
+
+def cache_key(aggregator, file_path):
+    """Key of an aggregated figure: the content of the master table plus the aggregation parameters.
+
+    The parameters include the grouping definitions the figure sums by, so editing a
+    group or a marker list invalidates the entry, while colors and plot settings do not.
+    """
+    key = {'figure': aggregator.name, 'input': file_digest(file_path), 'parameters': aggregator.parameters()}
+    return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _entry_path(aggregator, file_path):
+    return os.path.join(aggregate_cache_dir(file_path), f'{aggregator.name}_{cache_key(aggregator, file_path)}.pkl')
+
+
+def load_aggregate(aggregator, file_path):
+    """Return the cached aggregated state of ``aggregator`` for a master table, or None on a miss."""
+    path = _entry_path(aggregator, file_path)
+    try:
+        with open(path, 'rb') as entry_file:
+            cached = pickle.load(entry_file)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+    # Mark the entry as recently used, eviction goes by last use
+    os.utime(path)
+    return cached
+
+
+def store_aggregate(aggregator, file_path, max_bytes=MAX_CACHE_BYTES, max_age=MAX_AGE_SECONDS):
+    """Store an aggregated figure (partial sums, marker totals and all) and evict old entries."""
+    path = _entry_path(aggregator, file_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as entry_file:
+        pickle.dump(aggregator, entry_file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    evict(os.path.dirname(path), max_bytes, max_age)
+    return path
+
+
+def evict(folder, max_bytes=MAX_CACHE_BYTES, max_age=MAX_AGE_SECONDS):
+    """Remove the entries unused for longer than ``max_age`` seconds, then the least recently
+    used ones until the folder holds at most ``max_bytes``."""
+    entries = []
+    for name in os.listdir(folder):
+        if name.endswith('.pkl'):
+            stat = os.stat(os.path.join(folder, name))
+            entries.append((stat.st_mtime, stat.st_size, os.path.join(folder, name)))
+
+    now = time.time()
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    for last_used, size, path in entries:
+        if now - last_used <= max_age and total <= max_bytes:
+            break
+        os.remove(path)
+        total -= size
@@ -0,0 +1,176 @@
+import argparse
+import json
+import os
+import re
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from figure_definitions import CLUSTER_COLUMN, FUNCTION_COLUMN, TAXONOMY_COLUMN
+from master_table_loader import DEPTH_COLUMNS, MASTER_TABLE_FILE, cache_dir_for, file_digest, iter_master_table
+from normalization import marker_totals, normalize
+
+# Annotation columns covered by the index
+INDEXED_COLUMNS = [FUNCTION_COLUMN, CLUSTER_COLUMN, TAXONOMY_COLUMN]
+
+
+def _index_prefix(file_path):
+    # Index folders of one table start with its name, as tables in the same folder share the cache folder
+    return f'annotation_index_{os.path.splitext(os.path.basename(file_path))[0]}_'
+
+
+def index_dir_for(file_path):
+    # Keyed by the content of the master table, so an edited table gets a new index
+    return os.path.join(cache_dir_for(file_path), _index_prefix(file_path) + file_digest(file_path))
+
+
+def _remove_stale_indexes(file_path, folder):
+    # Indexes of earlier versions of the table: its name followed by another digest
+    stale = re.compile(re.escape(_index_prefix(file_path)) + '[0-9a-f]{64}')
+    cache_dir = os.path.dirname(folder)
+    for name in os.listdir(cache_dir):
+        if stale.fullmatch(name) and name != os.path.basename(folder):
+            shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+
+
+def build_index(file_path=MASTER_TABLE_FILE):
+    """Build the sidecar index of a master table in one streaming pass and return its folder.
+
+    For every indexed column the distinct values are numbered, and the row positions
+    are stored grouped by value (CSR layout: ``rows`` sorted by value, ``offsets``
+    marking where each value starts). The depth columns are stored as a raw float64
+    matrix, so profiles are read by row position without touching the table again.
+    The index is written to a folder of its own and moved in place when complete; when
+    another build of the same table got there first, its index is kept. Indexes of
+    earlier versions of the table are removed.
+    """
+    folder = index_dir_for(file_path)
+    tmp_folder = tempfile.mkdtemp(prefix=os.path.basename(folder) + '.', suffix='.tmp', dir=os.path.dirname(folder))
+    try:
+        _write_index(file_path, tmp_folder)
+    except BaseException:
+        shutil.rmtree(tmp_folder, ignore_errors=True)
+        raise
+    try:
+        os.replace(tmp_folder, folder)
+    except OSError:
+        # The folder exists and is not empty: a concurrent build finished first, and its index is complete
+        shutil.rmtree(tmp_folder, ignore_errors=True)
+        if not os.path.exists(os.path.join(folder, 'index.json')):
+            raise
+    _remove_stale_indexes(file_path, folder)
+    return folder
+
+
+def _write_index(file_path, tmp_folder):
+    # Value numbering, CSR row lists and depth matrix of the table, written to tmp_folder
+    value_ids = {column: {} for column in INDEXED_COLUMNS}
+    codes = {column: [] for column in INDEXED_COLUMNS}
+    n_rows = 0
+    with open(os.path.join(tmp_folder, 'depths.f8'), 'wb') as depth_file:
+        for chunk in iter_master_table(INDEXED_COLUMNS, file_path):
+            for column in INDEXED_COLUMNS:
+                ids = value_ids[column]
+                for value in chunk[column].dropna().unique():
+                    ids.setdefault(value, len(ids))
+                # Missing annotations get the code -1 and are left out of the index
+                codes[column].append(chunk[column].map(ids).fillna(-1).to_numpy(dtype=np.int64))
+            np.ascontiguousarray(chunk[DEPTH_COLUMNS].to_numpy(dtype=np.float64)).tofile(depth_file)
+            n_rows += len(chunk)
+
+    for column, column_codes in codes.items():
+        column_codes = np.concatenate(column_codes) if column_codes else np.empty(0, dtype=np.int64)
+        order = np.argsort(column_codes, kind='stable')
+        order = order[column_codes[order] >= 0]
+        counts = np.bincount(column_codes[order], minlength=len(value_ids[column]))
+        np.save(os.path.join(tmp_folder, f'{column}.rows.npy'), order)
+        np.save(os.path.join(tmp_folder, f'{column}.offsets.npy'), np.concatenate([[0], np.cumsum(counts)]))
+
+    with open(os.path.join(tmp_folder, 'index.json'), 'w') as meta_file:
+        json.dump({'n_rows': n_rows, 'depth_columns': DEPTH_COLUMNS,
+                   'values': {column: list(ids) for column, ids in value_ids.items()}}, meta_file)
+
+
+class AnnotationIndex:
+    """Row positions of every distinct annotation value, plus the depth matrix, read from a sidecar index."""
+
+    def __init__(self, folder):
+        with open(os.path.join(folder, 'index.json')) as meta_file:
+            meta = json.load(meta_file)
+        self.depth_columns = meta['depth_columns']
+        self.depths = np.memmap(os.path.join(folder, 'depths.f8'), dtype=np.float64, mode='r',
+                                shape=(meta['n_rows'], len(self.depth_columns)))
+        self.values = meta['values']
+        self.value_ids = {column: {value: i for i, value in enumerate(values)} for column, values in self.values.items()}
+        # Case-folded distinct values, for case-insensitive substring queries
+        self.folded = {column: [value.casefold() for value in values] for column, values in self.values.items()}
+        self.rows_by_value = {column: np.load(os.path.join(folder, f'{column}.rows.npy'), mmap_mode='r') for column in self.values}
+        self.offsets = {column: np.load(os.path.join(folder, f'{column}.offsets.npy')) for column in self.values}
+
+    @classmethod
+    def open(cls, file_path=MASTER_TABLE_FILE):
+        """Open the index of a master table, building it first if the table changed or was never indexed."""
+        folder = index_dir_for(file_path)
+        if not os.path.exists(folder):
+            build_index(file_path)
+        return cls(folder)
+
+    def rows(self, column, value):
+        """Row positions holding exactly ``value`` in ``column``."""
+        i = self.value_ids[column].get(value)
+        if i is None:
+            return np.empty(0, dtype=np.int64)
+        return np.asarray(self.rows_by_value[column][self.offsets[column][i]:self.offsets[column][i + 1]])
+
+    def matching_values(self, column, substring):
+        """Distinct values of ``column`` containing ``substring``, ignoring case."""
+        substring = substring.casefold()
+        return [value for value, folded in zip(self.values[column], self.folded[column]) if substring in folded]
+
+    def profile(self, column, values):
+        """Depth profiles (summed abundances) of a list of annotation values, as a value x depth table.
+
+        ``values`` may be any iterable of values, such as the keys of the Figure 5
+        marker gene dictionary; values absent from the table get a zero profile.
+        """
+        values = list(values)
+        row_lists = [self.rows(column, value) for value in values]
+        lengths = np.array([len(rows) for rows in row_lists], dtype=np.int64)
+
+        # Gather the rows of all values at once, then sum each value's segment
+        gathered = self.depths[np.concatenate(row_lists)] if lengths.sum() else np.empty((0, len(self.depth_columns)))
+        gathered = np.nan_to_num(gathered)
+        sums = np.zeros((len(values), len(self.depth_columns)))
+        present = lengths > 0
+        if present.any():
+            starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+            sums[present] = np.add.reduceat(gathered, starts[present], axis=0)
+        return pd.DataFrame(sums, index=values, columns=self.depth_columns)
+
+    def profile_containing(self, column, substring):
+        """Depth profiles of every value of ``column`` containing ``substring`` (case-insensitive)."""
+        return self.profile(column, self.matching_values(column, substring))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Depth profiles of annotation values, read from the sidecar index of the master table.')
+    parser.add_argument('values', nargs='*', help='annotation values to profile')
+    parser.add_argument('--column', default=FUNCTION_COLUMN, choices=INDEXED_COLUMNS, help='annotation column to query')
+    parser.add_argument('--contains', help='profile every value containing this text (case-insensitive)')
+    parser.add_argument('--normalize', help="normalize by 'total' or by a marker such as RpS3")
+    parser.add_argument('--input', default=MASTER_TABLE_FILE, help='master table CSV')
+    parser.add_argument('--output', help='write the profiles to this CSV instead of printing them')
+    args = parser.parse_args()
+
+    index = AnnotationIndex.open(args.input)
+    profiles = index.profile_containing(args.column, args.contains) if args.contains else index.profile(args.column, args.values)
+    if args.normalize:
+        totals = None if args.normalize == 'total' else marker_totals(args.input)
+        profiles = normalize(profiles, args.normalize, totals)
+
+    if args.output:
+        profiles.to_csv(args.output)
+    else:
+        print(profiles.to_string())
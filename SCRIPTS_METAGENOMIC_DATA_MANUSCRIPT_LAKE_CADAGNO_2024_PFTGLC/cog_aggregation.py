@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+def _letter_targets(cog_categories, supercategories):
+    # One row per (letter, target) pair: a letter counts toward its own COG category
+    # first and then toward every supercategory listing it, in dictionary order
+    pairs = [(letter, letter, 0) for letter in cog_categories]
+    for rank, (supercat, data) in enumerate(supercategories.items(), start=1):
+        pairs.extend((letter, supercat, rank) for letter in data['cogs'])
+    return pd.DataFrame(pairs, columns=['letter', 'target', 'rank'])
+
+
+def cog_category_abundances(df, cm_columns, cog_categories, supercategories, cog_column='COG_category'):
+    """Sum the depth abundances of every COG category and supercategory.
+
+    Each letter of a multi-letter COG string counts toward its category and toward the
+    supercategories containing it, exactly like walking the rows letter by letter. The
+    rows of the result appear in the order the categories are first met in the table.
+    """
+    cog_strings = df[cog_column].astype(str).to_numpy()
+    values = df[cm_columns].to_numpy(dtype=float)
+
+    # Explode the COG strings into one entry per letter, keeping the row each letter came from
+    lengths = np.fromiter((len(cog) for cog in cog_strings), dtype=np.int64, count=len(cog_strings))
+    letters = pd.DataFrame({
+        'letter': np.array(list(''.join(cog_strings)), dtype=object),
+        'row': np.repeat(np.arange(len(cog_strings)), lengths),
+    })
+    letters['position'] = np.arange(len(letters))
+
+    # Map letters to categories and supercategories, dropping letters that belong to neither
+    hits = letters.merge(_letter_targets(cog_categories, supercategories), on='letter')
+    if hits.empty:
+        return pd.DataFrame(columns=cm_columns, dtype=float)
+
+    # Order the targets by their first appearance (letter position, then category before supercategory)
+    first_seen = hits.sort_values(['position', 'rank']).drop_duplicates('target')
+    targets = first_seen['target'].tolist()
+    target_index = pd.Index(targets).get_indexer(hits['target'])
+
+    # Sparse target x letter-hit indicator, then one product for all sums. Keeping one column
+    # per hit (in table order) adds a row twice when it lists two letters of the same target,
+    # so the floating point sums match the letter-by-letter loop bit for bit
+    hits = hits.sort_values('position')
+    indicator = sparse.csr_matrix(
+        (np.ones(len(hits)), (target_index[hits.index], np.arange(len(hits)))),
+        shape=(len(targets), len(hits)),
+    )
+    return pd.DataFrame(indicator @ values[hits['row'].to_numpy()], index=targets, columns=cm_columns)
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from master_table_loader import CHUNK_SIZE, DEPTH_COLUMNS, MASTER_TABLE_FILE, iter_master_table
+
+# Precision of the depth matrix unless asked otherwise; float64 keeps the sums of the figures exact
+DEFAULT_DTYPE = np.float32
+
+
+class CompactMasterTable:
+    """The master table as dictionary-encoded annotation columns plus one contiguous depth matrix.
+
+    ``depths`` is a C-contiguous rows x depths array in the canonical depth order
+    (``DEPTH_COLUMNS``), float32 by default or float64. Annotation columns are
+    ``pd.Categorical``: every distinct string is stored once, rows hold integer codes.
+    Slices of rows (``depth_view``, ``to_frame``) share memory with the matrix instead
+    of copying it.
+    """
+
+    def __init__(self, depths, annotations):
+        self.depths = np.ascontiguousarray(depths)
+        self.depths.flags.writeable = False
+        self.annotations = annotations
+
+    @classmethod
+    def from_frame(cls, df, dtype=DEFAULT_DTYPE):
+        """Encode a loaded master table (depth columns plus any annotation columns)."""
+        depths = df[DEPTH_COLUMNS].to_numpy(dtype=dtype)
+        annotations = {column: pd.Categorical(df[column]) for column in df.columns if column not in DEPTH_COLUMNS}
+        return cls(depths, annotations)
+
+    @classmethod
+    def load(cls, columns=(), file_path=MASTER_TABLE_FILE, dtype=DEFAULT_DTYPE, chunksize=CHUNK_SIZE):
+        """Load the depth columns plus the requested annotation columns of a master table.
+
+        The table is encoded chunk by chunk, so the text columns of the whole table are
+        never held as Python strings at once.
+        """
+        depth_parts = []
+        annotation_parts = {column: [] for column in columns if column not in DEPTH_COLUMNS}
+        for chunk in iter_master_table(columns, file_path, chunksize):
+            depth_parts.append(chunk[DEPTH_COLUMNS].to_numpy(dtype=dtype))
+            for column, parts in annotation_parts.items():
+                parts.append(pd.Categorical(chunk[column].astype(object)))
+
+        depths = np.concatenate(depth_parts) if depth_parts else np.empty((0, len(DEPTH_COLUMNS)), dtype=dtype)
+        annotations = {
+            column: union_categoricals(parts, sort_categories=True) if parts else pd.Categorical([])
+            for column, parts in annotation_parts.items()
+        }
+        return cls(depths, annotations)
+
+    def __len__(self):
+        return len(self.depths)
+
+    @property
+    def nbytes(self):
+        """Memory held by the depth matrix and the encoded annotation columns."""
+        annotation_bytes = sum(column.codes.nbytes + column.categories.memory_usage(deep=True)
+                               for column in self.annotations.values())
+        return self.depths.nbytes + annotation_bytes
+
+    def depth_view(self, start=0, stop=None):
+        """Read-only view (no copy) of the depth rows ``start:stop``."""
+        return self.depths[start:stop]
+
+    def to_frame(self, start=0, stop=None):
+        """DataFrame of the rows ``start:stop``, laid out like ``load_master_table``.
+
+        The depth columns are one block viewing the depth matrix and the annotation
+        columns stay categorical, so building the frame copies no abundances.
+        """
+        frame = pd.DataFrame(self.depth_view(start, stop), columns=DEPTH_COLUMNS, copy=False)
+        for column, values in self.annotations.items():
+            frame[column] = values[start:stop]
+        return frame
+
+    def isin(self, column, values):
+        """Mask of the rows whose annotation is one of ``values``, tested on the distinct values only."""
+        annotation = self.annotations[column]
+        wanted = np.flatnonzero(annotation.categories.isin(list(values)))
+        return np.isin(annotation.codes, wanted)
+
+    def contains(self, column, substring, case=False):
+        """Mask of the rows whose annotation contains ``substring``, tested on the distinct values only."""
+        annotation = self.annotations[column]
+        wanted = np.flatnonzero(annotation.categories.str.contains(substring, case=case, regex=False))
+        return np.isin(annotation.codes, wanted)
+
+    def group_sums(self, column, mask=None):
+        """Depth sums of the rows of every annotation value (rows without a value are skipped).
+
+        ``mask`` restricts the sum to some rows. Values are summed in float64 with one
+        ``np.bincount`` per depth; the result lists the values with at least one row.
+        """
+        annotation = self.annotations[column]
+        codes, depths = annotation.codes, self.depths
+        if mask is not None:
+            codes, depths = codes[mask], depths[mask]
+        keep = codes >= 0
+        # Missing abundances count as zero, like in the figures
+        codes, depths = codes[keep], np.nan_to_num(depths[keep])
+
+        n_values = len(annotation.categories)
+        sums = np.column_stack([np.bincount(codes, weights=depths[:, j], minlength=n_values)
+                                for j in range(len(DEPTH_COLUMNS))]) if n_values else np.empty((0, len(DEPTH_COLUMNS)))
+        present = np.bincount(codes, minlength=n_values) > 0
+        return pd.DataFrame(sums[present], index=annotation.categories[present].astype(object), columns=DEPTH_COLUMNS)
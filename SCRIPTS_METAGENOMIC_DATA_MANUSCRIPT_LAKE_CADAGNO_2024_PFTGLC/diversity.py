@@ -0,0 +1,124 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from figure_pipeline import DATA_ONLY_FLAG, aggregate_figures
+from master_table_loader import MASTER_TABLE_FILE
+
+# Sample labels are read the same way as in the 16S scripts
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from sample_depths import depth_of  # noqa: E402
+
+# OTU table of the 16S scripts, relative to the metagenomic scripts
+OTU_TABLE_FILE = os.path.join('..', 'SCRIPTS_TARGETED_16_SEQUENCING_DATA_MANUSCRIPT_LAKE_CADAGNO_2024_PFTGLC',
+                              'REAL0.97__complete_otu_table_qiime_Cara_Classification_97_identity.csv')
+
+# Bytes of the (taxa x block x samples) array of one Bray-Curtis block
+MAX_BLOCK_BYTES = 64 * 1024 ** 2
+
+DISTANCE_METRICS = ['braycurtis', 'jaccard']
+
+
+def depth_ordered(abundance_df):
+    """Taxa x sample table with the sample columns sorted from the shallowest depth down, counts as floats."""
+    columns = sorted(abundance_df.columns, key=depth_of)
+    return abundance_df[columns].apply(pd.to_numeric, errors='coerce').fillna(0).astype(float)
+
+
+def alpha_diversity(abundance_df):
+    """Richness, Shannon index (natural log) and Gini-Simpson index (1 - sum p^2) of every sample (column)."""
+    abundance_df = depth_ordered(abundance_df)
+    values = abundance_df.to_numpy()
+    totals = values.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        p = values / totals
+        shannon = -np.where(p > 0, p * np.log(p), 0).sum(axis=0)
+    return pd.DataFrame({'richness': (values > 0).sum(axis=0),
+                         'shannon': np.where(totals > 0, shannon, np.nan),
+                         'simpson': np.where(totals > 0, 1 - (p ** 2).sum(axis=0), np.nan),
+                         'total': totals}, index=abundance_df.columns)
+
+
+def _bray_curtis(values, max_block_bytes):
+    # 1 - 2 * sum(min(x, y)) / sum(x + y), over blocks of samples against all of them
+    n_taxa, n_samples = values.shape
+    totals = values.sum(axis=0)
+    shared = np.empty((n_samples, n_samples))
+    block = max(1, max_block_bytes // max(n_taxa * n_samples * values.itemsize, 1))
+    for start in range(0, n_samples, block):
+        stop = min(start + block, n_samples)
+        shared[start:stop] = np.minimum(values[:, start:stop, None], values[:, None, :]).sum(axis=0)
+    union = totals[:, None] + totals[None, :]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(union > 0, 1 - 2 * shared / union, 0)
+
+
+def _jaccard(values):
+    # 1 - shared taxa / taxa present in either sample, the shared taxa from one matrix product
+    present = (values > 0).astype(float)
+    shared = present.T @ present
+    richness = present.sum(axis=0)
+    union = richness[:, None] + richness[None, :] - shared
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(union > 0, 1 - shared / union, 0)
+
+
+def distance_matrix(abundance_df, metric='braycurtis', max_block_bytes=MAX_BLOCK_BYTES):
+    """Sample x sample distances ('braycurtis' on the abundances, 'jaccard' on presence), in depth order.
+
+    Bray-Curtis is computed in blocks of samples so that no intermediate array
+    exceeds ``max_block_bytes``.
+    """
+    abundance_df = depth_ordered(abundance_df)
+    values = abundance_df.to_numpy()
+    if metric == 'braycurtis':
+        distances = _bray_curtis(values, max_block_bytes)
+    elif metric == 'jaccard':
+        distances = _jaccard(values)
+    else:
+        raise ValueError(f"unknown metric '{metric}', expected one of {', '.join(DISTANCE_METRICS)}")
+    np.fill_diagonal(distances, 0)
+    return pd.DataFrame(distances, index=abundance_df.columns, columns=abundance_df.columns)
+
+
+def otu_abundances(file_path=OTU_TABLE_FILE):
+    """OTU x sample counts of an OTU table (the input of 97_BARPLOT.py), indexed by OTU."""
+    otu_df = pd.read_csv(file_path)
+    otu_df.columns = otu_df.columns.str.strip()
+    sample_columns = [column for column in otu_df.columns if '_cm' in column]
+    return otu_df.set_index(otu_df.columns[0])[sample_columns]
+
+
+def taxonomic_profile(file_path=MASTER_TABLE_FILE):
+    """Figure 1B taxonomic group x depth profile (RpS3 abundances normalized per sample)."""
+    aggregator, = aggregate_figures(['figure_1b'], file_path)
+    return aggregator.summary()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Alpha diversity per depth and distances between depths.')
+    parser.add_argument('source', choices=['otu', 'figure-1b'],
+                        help='OTU table of the 16S data, or the Figure 1B RpS3 profile of the master table')
+    parser.add_argument('--input', help='OTU table CSV or master table CSV (default: the ones of the figure scripts)')
+    parser.add_argument('--output-prefix', help='prefix of the output files (default: the source name)')
+    parser.add_argument(DATA_ONLY_FLAG, action='store_true', help='write the CSVs only, without the heatmaps')
+    args = parser.parse_args()
+
+    if args.source == 'otu':
+        abundance_df = otu_abundances(args.input or OTU_TABLE_FILE)
+    else:
+        abundance_df = taxonomic_profile(args.input or MASTER_TABLE_FILE)
+    prefix = args.output_prefix or f"{args.source.replace('-', '_')}_diversity"
+
+    # Alpha diversity of every depth, then both distance matrices and their heatmaps
+    alpha_diversity(abundance_df).to_csv(f'{prefix}_alpha.csv')
+    for metric in DISTANCE_METRICS:
+        distances = distance_matrix(abundance_df, metric)
+        distances.to_csv(f'{prefix}_{metric}.csv')
+        if not args.data_only:
+            import figure_rendering
+            figure_rendering.plot_depth_distances(distances, f'{prefix}_{metric}.pdf', metric)
+    print(f"Diversity of {abundance_df.shape[1]} samples saved to {prefix}_alpha.csv and {prefix}_<metric>.csv/.pdf")
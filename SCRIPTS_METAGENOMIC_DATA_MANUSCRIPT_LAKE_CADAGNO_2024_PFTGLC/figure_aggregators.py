@@ -0,0 +1,277 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from cog_aggregation import cog_category_abundances
+from figure_definitions import (CLUSTER_COLUMN, CLUSTER_GROUP_COLUMN, COG_COLUMN, FUNCTION_COLUMN, TAXONOMY_COLUMN,
+                                cog_categories, cog_cm_columns, group_colors, marker_genes, supercategories)
+from master_table_loader import DEPTH_COLUMNS
+from normalization import RPS3, marker_totals_of, normalize
+
+
+def accumulate(total, partial):
+    """Add the partial sums of one batch to the running totals.
+
+    Rows keep the order in which they were first met, so feeding the table in
+    batches gives the same row order as aggregating it in one go.
+    """
+    # The group labels become the unnamed row index, like in the summary tables
+    partial = partial.rename_axis(None)
+    if total is None:
+        return partial
+    index = total.index.append(partial.index[~partial.index.isin(total.index)])
+    return total.reindex(index, fill_value=0) + partial.reindex(index, fill_value=0)
+
+
+def contains_rps3(annotations):
+    """Mask of the annotations containing 'rps3' (case-insensitive).
+
+    The substring test only runs on the distinct annotations of the batch,
+    the rows are then selected with a hash lookup.
+    """
+    distinct = pd.Series(annotations.dropna().unique(), dtype=object)
+    return annotations.isin(distinct[distinct.str.contains('rps3', case=False)])
+
+
+class FigureAggregator:
+    """Collect the summary of one figure from batches of master-table rows.
+
+    Subclasses list the annotation ``columns`` they need, pick the rows of a batch
+    the figure uses in ``select``, add those rows to their partial sums in ``add``
+    and build the figure's summary table in ``summary``. Only ``render`` imports the
+    plotting code (figure_rendering.py and matplotlib), so aggregating and writing
+    the summary CSVs never loads it.
+    Aggregators normalizing by a marker set ``uses_marker_totals`` and read the
+    per-sample marker totals from ``marker_totals`` (see normalization.py).
+    """
+
+    name = None
+    columns = []
+    csv_file = None
+    pdf_file = None
+    uses_marker_totals = False
+    marker_totals = None
+    # Bumped when the aggregation changes, so aggregates cached by older code are not reused
+    cache_version = 1
+
+    def parameters(self):
+        """Everything but the master table the aggregated state depends on (see aggregate_cache.py)."""
+        return {'version': self.cache_version, 'columns': self.columns, 'depth_columns': DEPTH_COLUMNS}
+
+    def select(self, batch):
+        raise NotImplementedError
+
+    def add(self, rows):
+        raise NotImplementedError
+
+    def update(self, batch):
+        self.add(self.select(batch))
+
+    def summary(self):
+        raise NotImplementedError
+
+    def write_csv(self, output_dir='.'):
+        self.summary().to_csv(os.path.join(output_dir, self.csv_file))
+
+    def render(self, output_dir='.'):
+        raise NotImplementedError
+
+
+class TaxonomicGroupAggregator(FigureAggregator):
+    """Figure 1B: RpS3 abundances per taxonomic group, normalized per sample."""
+
+    name = 'figure_1b'
+    columns = [FUNCTION_COLUMN, TAXONOMY_COLUMN]
+    csv_file = 'Figure_1_b_rps3_normalized_abundance_by_taxonomic_groups.csv'
+    pdf_file = 'Figure_1_b_rps3_normalized_abundance_by_taxonomic_groups.pdf'
+
+    def __init__(self):
+        self.grouped = None
+
+    def parameters(self):
+        return dict(super().parameters(), marker='rps3', groups=list(group_colors))
+
+    def select(self, batch):
+        # Rows where the functional annotation contains 'rps3' (case-insensitive)
+        return batch[contains_rps3(batch[FUNCTION_COLUMN])]
+
+    def add(self, rps3_df):
+        abundances = rps3_df[DEPTH_COLUMNS].apply(pd.to_numeric, errors='coerce').fillna(0)
+        self.grouped = accumulate(self.grouped, abundances.groupby(rps3_df[TAXONOMY_COLUMN], observed=True).sum())
+
+    def summary(self):
+        df_grouped = self.grouped if self.grouped is not None else pd.DataFrame(columns=DEPTH_COLUMNS, dtype=float)
+
+        # Keep the groups from the color list and sum everything else into "Others"
+        df_selected = df_grouped.loc[df_grouped.index.intersection(group_colors.keys())]
+        df_others = df_grouped.loc[~df_grouped.index.isin(group_colors.keys())].sum().to_frame().T
+        df_others.index = ['Others']
+
+        # Sort the groups in the plotting order and normalize by the total sum of each sample
+        df_combined = pd.concat([df_selected, df_others]).reindex(group_colors.keys())
+        return normalize(df_combined, 'total')
+
+    def render(self, output_dir='.'):
+        import figure_rendering
+        return figure_rendering.plot_taxonomic_groups(self.summary(), os.path.join(output_dir, self.pdf_file))
+
+
+class BathyarchaeiaClusterAggregator(FigureAggregator):
+    """Figure 3: Candidatus Bathyarchaeia cluster abundances normalized by RpS3."""
+
+    name = 'figure_3'
+    columns = [CLUSTER_COLUMN, CLUSTER_GROUP_COLUMN]
+    csv_file = 'bathyarchaeia_cluster_summary_abundances.csv'
+    pdf_file = 'Figure_3_manuscript_Candidatus_Bathyarchaeia_sugroups.pdf'
+    uses_marker_totals = True
+    cache_version = 4
+
+    def __init__(self):
+        self.cluster_abundances = None
+        # Phylogenetic group of each cluster, taken from the first row of the cluster
+        self.cluster_groups = {}
+
+    def parameters(self):
+        return dict(super().parameters(), marker=RPS3)
+
+    def select(self, batch):
+        # Rows assigned to a bathyarchaeia cluster
+        return batch[batch[CLUSTER_COLUMN].notna()]
+
+    def add(self, valid_bathy_df):
+        clusters = valid_bathy_df[CLUSTER_COLUMN]
+        partial = valid_bathy_df[DEPTH_COLUMNS].astype(float).groupby(clusters, sort=False, observed=True).sum()
+        self.cluster_abundances = accumulate(self.cluster_abundances, partial)
+
+        first_rows = valid_bathy_df.drop_duplicates(CLUSTER_COLUMN)
+        for cluster, group in zip(first_rows[CLUSTER_COLUMN], first_rows[CLUSTER_GROUP_COLUMN]):
+            self.cluster_groups.setdefault(cluster, group)
+
+    def summary(self):
+        if self.cluster_abundances is None:
+            return pd.DataFrame(columns=DEPTH_COLUMNS, dtype=float)
+        return normalize(self.cluster_abundances, RPS3, self.marker_totals)
+
+    def render(self, output_dir='.'):
+        import figure_rendering
+        return figure_rendering.plot_bathyarchaeia_clusters(self.summary(), self.cluster_groups,
+                                                            os.path.join(output_dir, self.pdf_file))
+
+
+class CogCategoryAggregator(FigureAggregator):
+    """Figure 4: abundances of the COG categories and supercategories."""
+
+    name = 'figure_4'
+    columns = [COG_COLUMN]
+    csv_file = 'Figure_4_abundances_sum_per_sample_per_C0G_category.csv'
+    pdf_file = 'Figure_4_main_manuscript_COG_categories.pdf'
+
+    def __init__(self):
+        self.abundances = None
+
+    def parameters(self):
+        return dict(super().parameters(), categories=list(cog_categories), samples=cog_cm_columns,
+                    supercategories={supercat: data['cogs'] for supercat, data in supercategories.items()})
+
+    def select(self, batch):
+        # Rows where COG_category is not NA or '-'
+        return batch[(batch[COG_COLUMN].notna()) & (batch[COG_COLUMN] != '-')]
+
+    def add(self, valid_df):
+        partial = cog_category_abundances(valid_df, cog_cm_columns, cog_categories, supercategories)
+        self.abundances = accumulate(self.abundances, partial)
+
+    def summary(self):
+        if self.abundances is None:
+            return pd.DataFrame(columns=cog_cm_columns, dtype=float)
+        return self.abundances
+
+    def normalized(self):
+        """Relative abundances per sample, in depth order."""
+        abundances = self.summary()
+        normalized_abundance_df = normalize(abundances, 'total')
+
+        # Check if the relative abundance sums to 1 for each sample
+        for sample in cog_cm_columns:
+            # Use round() to handle float values safely
+            total_relative = np.round(normalized_abundance_df[sample].sum(), 6)
+
+            if total_relative != 1:
+                print(f"Warning: Total relative abundance for {sample} does not add up to 1. It's {total_relative}.")
+
+        return normalized_abundance_df[[column for column in DEPTH_COLUMNS if column in normalized_abundance_df.columns]]
+
+    def write_csv(self, output_dir='.'):
+        # Sum of abundances per category (before normalization)
+        abundances_sum_df = self.summary().sum(axis=1)
+        abundances_sum_df.to_csv(os.path.join(output_dir, self.csv_file), header=["Total Abundance"])
+
+    def render(self, output_dir='.'):
+        import figure_rendering
+        return figure_rendering.plot_cog_categories(self.normalized(), os.path.join(output_dir, self.pdf_file))
+
+
+class MarkerGeneAggregator(FigureAggregator):
+    """Figure 5: marker gene abundances normalized by RpS3."""
+
+    name = 'figure_5'
+    columns = [FUNCTION_COLUMN]
+    csv_file = 'Figure_5_summarized_data_normalized_abundances_marker_genes.csv'
+    pdf_file = 'Figure_5_manuscript__marker_genes.pdf'
+    uses_marker_totals = True
+
+    def __init__(self):
+        self.gene_abundances = None
+
+    def parameters(self):
+        return dict(super().parameters(), marker=RPS3, genes=list(marker_genes))
+
+    def select(self, batch):
+        # Rows annotated with one of the marker genes
+        return batch[batch[FUNCTION_COLUMN].isin(marker_genes.keys())]
+
+    def add(self, valid_marker_df):
+        genes = valid_marker_df[FUNCTION_COLUMN]
+        partial = valid_marker_df[DEPTH_COLUMNS].astype(float).groupby(genes, observed=True).sum()
+        self.gene_abundances = accumulate(self.gene_abundances, partial)
+
+    def summary(self):
+        # Genes without any hit get a zero abundance
+        gene_abundances = self.gene_abundances
+        if gene_abundances is None:
+            gene_abundances = pd.DataFrame(columns=DEPTH_COLUMNS, dtype=float)
+        gene_abundances = gene_abundances.reindex(list(marker_genes.keys()), fill_value=0)
+
+        # Normalize by the total RpS3 abundance and round values to 6 decimals
+        return normalize(gene_abundances, RPS3, self.marker_totals).round(6)
+
+    def render(self, output_dir='.'):
+        import figure_rendering
+        return figure_rendering.plot_marker_genes(self.summary(), os.path.join(output_dir, self.pdf_file))
+
+
+class MarkerTotalsAggregator:
+    """Per-sample totals of every functional annotation, the denominators of the marker normalization."""
+
+    name = 'marker_totals'
+    columns = [FUNCTION_COLUMN]
+
+    def __init__(self):
+        self.totals = None
+
+    def select(self, batch):
+        return batch
+
+    def add(self, rows):
+        self.totals = accumulate(self.totals, marker_totals_of(rows))
+
+    def update(self, batch):
+        self.add(batch)
+
+
+# Aggregators of all metagenomic figures, by name
+FIGURE_AGGREGATORS = {
+    aggregator.name: aggregator
+    for aggregator in [TaxonomicGroupAggregator, BathyarchaeiaClusterAggregator, CogCategoryAggregator, MarkerGeneAggregator]
+}
@@ -0,0 +1,104 @@
+# Group definitions, orders and colors of the metagenomic figures of the main manuscript
+
+# Annotation columns of the master table
+TAXONOMY_COLUMN = 'BLAST_taxonomic_annotation'
+FUNCTION_COLUMN = 'Functional_annotation_short_blast_or_tree_placement'
+CLUSTER_COLUMN = 'Assigned_ID_Candidatus_Bathyarchaeia_cluster'
+CLUSTER_GROUP_COLUMN = 'Taxonomic_assignment_Zhou_Hou_GDBTk_Ca_Bathyarchaeia'
+COG_COLUMN = 'COG_category'
+
+# Figure 1B: taxonomic groups with their respective colors, in plotting order
+group_colors = {
+    "Acidobacteria": "#80fed4",
+    "Actinobacteria": "#238b21",
+    "Candidatus Aminicenantes": "#528a8b",
+    "Deltaproteobacteria": "#fe0000",
+    "Other Proteobacteria": "#fe69b4",
+    "Anaerolineae": "#8b0100",
+    "Dehalococcoidia": "#bfff3d",
+    "Other Chloroflexi": "#2f4f4f",
+    "Candidatus Atribacteria": "#473c8b",
+    "Bacteroidetes": "#00ffff",
+    "Candidatus Bipolaricaulota": "#feff00",
+    "Firmicutes": "#ffebcd",
+    "Nitrospirae": "#000000",
+    "Planctomycetes": "#ff8c00",
+    "Candidatus Aenigmarchaeota": "#e5ce15",
+    "Euryarchaeota": "#ba2452",
+    "Candidatus Woesearchaeota": "#9400d3",
+    "Candidatus Bathyarchaeia": "#181a6f",
+    "Unclassified archaea": "#ffc0cb",
+    "Others": "#bebebe"  # Default color for 'Others'
+}
+
+# Figure 3: colors of the phylogenetic groups ('Taxonomic_assignment_Zhou_Hou_GDBTk_Ca_Bathyarchaeia')
+bathyarchaeia_color_map = {
+    'Wuzhiqiibiales (Subgroup 15 - Ca. Bathyarchaeota B23)': '#ab8cc6',
+    'Xuanwarculales (Subgroup 17 - Ca. Bathyarchaeota RGB_16_48_13)': '#99d96a',
+    'Houtuarculales (Subgroup 18 - Ca. Bathyarchaeota 13_38_9)': '#824fcb',
+    'Baizomonadales (Subgroup 6 - Ca. Bathyarchaeota 13_46_16b)': '#3d59ae',
+    'Baizomonadales (Subgroup 13 - Ca. Bathyarchaeota B26-1)': '#e5ce53'
+}
+
+# Figure 3: clusters in the required order
+cluster_order = ['1B', '1C', '1D', '2A', '2B', '3A', '3B', '3C', '3D', '4A', '4B', '4D', '4E', '4F', '4G', '4H', '5A', '5B', '5C', '5D', '5E', '5F', '5G', '5H']
+
+# Figure 4: COG categories and their respective colors
+cog_categories = {
+    'E': ('Amino acid transport and metabolism', '#dbc750'),
+    'G': ('Carbohydrate transport and metabolism', '#807a38'),
+    'H': ('Coenzyme transport and metabolism', '#346566'),
+    'V': ('Defense mechanisms', '#ffcd4b'),
+    'C': ('Energy production and conversion', '#a14c08'),
+    'P': ('Inorganic ion transport and metabolism', '#2ca7bc'),
+    'I': ('Lipid transport and metabolism', '#fd9e55'),
+    'F': ('Nucleotide transport and metabolism', '#ff6f0c'),
+    'S': ('Poorly characterized', '#98c979'),
+    'Q': ('Secondary metabolites biosynthesis, transport and catabolism', '#228e44')
+}
+
+supercategories = {
+    'CELLULAR PROCESSES AND SIGNALING (D,Y,T,M,N,Z,W,U,O)': {
+        'cogs': ['D', 'Y', 'T', 'M', 'N', 'Z', 'W', 'U', 'O'],
+        'color': '#7fa69c'
+    },
+    'INFORMATION STORAGE AND PROCESSING (J,A,K,L,B)': {
+        'cogs': ['J', 'A', 'K', 'L', 'B'],
+        'color': '#76c9de'
+    }
+}
+
+# Figure 4: sample columns in the order the category totals are summed over
+cog_cm_columns = ['566_cm', '3_cm', '187_cm', '382_cm', '40_cm', '283_cm', '233_cm',
+                  '153_cm', '532_cm', '738_cm', '582_cm', '693_cm', '213_cm']
+
+# Figure 5: marker genes and the element cycle they belong to
+marker_genes = {
+    'AcsA': 'Carbon',
+    'CdhC': 'Carbon',
+    'RuBisCO_Type_I': 'Carbon',
+    'RuBisCO_Type_III': 'Carbon',
+    'McrA': 'Carbon',
+    'DsrA': 'Sulfur',
+    'DsrB': 'Sulfur',
+    'AprA': 'Sulfur',
+    'AprB': 'Sulfur',
+    'NarG': 'Nitrogen',
+    'NarH': 'Nitrogen',
+    'NifD': 'Nitrogen',
+    'NifH': 'Nitrogen',
+    'NifK': 'Nitrogen',
+    'NfrA': 'Nitrogen',
+    'NfrH': 'Nitrogen',
+    'NirD': 'Nitrogen',
+    'NorB': 'Nitrogen',
+    'NorC': 'Nitrogen',
+    'HAO': 'Nitrogen'
+}
+
+# Figure 5: colors of the elements
+element_color_map = {'Carbon': '#fbbd65', 'Sulfur': '#d88c8c', 'Nitrogen': '#b8d39b'}
+
+# Figure 5: marker genes in the required order
+marker_genes_order = ['AcsA', 'CdhC', 'RuBisCO_Type_I', 'RuBisCO_Type_III', 'McrA', 'DsrA', 'DsrB', 'AprA', 'AprB',
+                      'NarG', 'NarH', 'NifD', 'NifH', 'NifK', 'NfrA', 'NfrH', 'NirD', 'NorB', 'NorC', 'HAO']
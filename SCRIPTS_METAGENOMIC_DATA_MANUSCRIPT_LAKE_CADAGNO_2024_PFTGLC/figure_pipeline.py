@@ -0,0 +1,163 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from aggregate_cache import load_aggregate, store_aggregate
+from compact_table import CompactMasterTable
+from figure_aggregators import FIGURE_AGGREGATORS, MarkerTotalsAggregator
+from master_table_loader import DEPTH_COLUMNS, MASTER_TABLE_FILE, iter_master_table
+from normalization import load_marker_totals, save_marker_totals
+
+# The stage profiler and the data-only option are shared with the 16S scripts and the benchmarks
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from script_options import DATA_ONLY_FLAG, data_only_requested  # noqa: E402,F401
+from stage_profiler import DISABLED_PROFILER, StageProfiler, profiling_requested  # noqa: E402
+
+# Number of master-table rows handed to the aggregators at a time
+BATCH_SIZE = 1_000_000
+
+
+def iter_batches(table, batch_size=BATCH_SIZE):
+    """Yield consecutive row batches of a compact master table, as frames viewing its depth matrix."""
+    for start in range(0, len(table), batch_size):
+        yield table.to_frame(start, start + batch_size)
+
+
+def _profiled_chunks(chunks, profiler):
+    # Reading each chunk of a streamed table counts towards the load stage
+    chunks = iter(chunks)
+    while True:
+        with profiler.stage('load') as stage:
+            chunk = next(chunks, None)
+            stage.rows_out = 0 if chunk is None else len(chunk)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def aggregate_figures(figures=None, file_path=MASTER_TABLE_FILE, batch_size=BATCH_SIZE, streaming=False,
+                      profiler=DISABLED_PROFILER, use_cache=True):
+    """Read the master table once and feed every row batch to the aggregators of all requested figures.
+
+    In streaming mode the table is never loaded as a whole: it is read in chunks of
+    ``batch_size`` rows and the aggregators only keep their running partial sums,
+    so peak memory does not grow with the size of the table.
+    With ``use_cache`` figures already aggregated from the same table content and
+    definitions are read back from the aggregate cache, and the table is only read
+    for the others. Reading, filtering and aggregating are timed as stages of ``profiler``.
+    """
+    aggregators = [FIGURE_AGGREGATORS[name]() for name in (figures or FIGURE_AGGREGATORS)]
+    if not use_cache:
+        return _scan(aggregators, file_path, batch_size, streaming, profiler)
+
+    # Figures aggregated by an earlier run come back from the cache, the table is scanned for the rest
+    cached = {}
+    for aggregator in aggregators:
+        with profiler.stage(f'{aggregator.name}: cache lookup'):
+            cached[aggregator.name] = load_aggregate(aggregator, file_path)
+    missing = [aggregator for aggregator in aggregators if cached[aggregator.name] is None]
+    if missing:
+        for aggregator in _scan(missing, file_path, batch_size, streaming, profiler):
+            store_aggregate(aggregator, file_path)
+            cached[aggregator.name] = aggregator
+    return [cached[aggregator.name] for aggregator in aggregators]
+
+
+def _scan(aggregators, file_path, batch_size, streaming, profiler):
+    # Marker totals are computed once per table content; on a first run they join the same scan
+    marker_totals = None
+    totals_aggregator = None
+    if any(aggregator.uses_marker_totals for aggregator in aggregators):
+        marker_totals = load_marker_totals(file_path)
+        if marker_totals is None:
+            totals_aggregator = MarkerTotalsAggregator()
+    scan = aggregators + ([totals_aggregator] if totals_aggregator else [])
+
+    # The union of the annotation columns the figures need, read in a single pass
+    columns = list(dict.fromkeys(column for aggregator in scan for column in aggregator.columns))
+    if streaming:
+        batches = _profiled_chunks(iter_master_table(columns, file_path, batch_size), profiler)
+    else:
+        # Categorical annotations and one float64 depth matrix (float64 keeps the published sums)
+        with profiler.stage('load') as stage:
+            table = CompactMasterTable.load(columns, file_path, dtype=np.float64)
+            stage.rows_out = len(table)
+        batches = iter_batches(table, batch_size)
+
+    for batch in batches:
+        for aggregator in scan:
+            with profiler.stage(f'{aggregator.name}: filter', len(batch)) as stage:
+                rows = aggregator.select(batch)
+                stage.rows_out = len(rows)
+            with profiler.stage(f'{aggregator.name}: aggregate', len(rows)):
+                aggregator.add(rows)
+
+    if totals_aggregator is not None:
+        marker_totals = totals_aggregator.totals
+        if marker_totals is None:
+            marker_totals = pd.DataFrame(columns=DEPTH_COLUMNS, dtype=float)
+        save_marker_totals(file_path, marker_totals)
+    for aggregator in aggregators:
+        aggregator.marker_totals = marker_totals
+    return aggregators
+
+
+def figure_summary(name, file_path=MASTER_TABLE_FILE, use_cache=True):
+    """Summary table of one figure (as written to its CSV), without rendering it."""
+    aggregator, = aggregate_figures([name], file_path, use_cache=use_cache)
+    return aggregator.summary()
+
+
+def export_figure(aggregator, output_dir='.', profiler=DISABLED_PROFILER, render=True):
+    """Write the summary CSV and, with ``render``, the PDF of an aggregated figure; return the figure (or None)."""
+    # The summary is normalized again when written; it is only built on its own to time it
+    if profiler.enabled:
+        with profiler.stage(f'{aggregator.name}: normalize') as stage:
+            stage.rows_out = len(aggregator.summary())
+    with profiler.stage(f'{aggregator.name}: export CSV'):
+        aggregator.write_csv(output_dir)
+    if not render:
+        return None
+    with profiler.stage(f'{aggregator.name}: render'):
+        return aggregator.render(output_dir)
+
+
+def run_pipeline(figures=None, file_path=MASTER_TABLE_FILE, output_dir='.', batch_size=BATCH_SIZE, streaming=False,
+                 profile=False, use_cache=True, render=True):
+    """Aggregate all requested figures in one pass, then write their summary CSVs and, with ``render``, PDFs.
+
+    With ``profile`` a JSON report of the stage timings is written to the output folder.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    profiler = StageProfiler(profile)
+    aggregators = aggregate_figures(figures, file_path, batch_size, streaming, profiler, use_cache)
+    for aggregator in aggregators:
+        fig = export_figure(aggregator, output_dir, profiler, render)
+        if fig is not None:
+            import matplotlib.pyplot as plt
+            plt.close(fig)
+    profiler.write_report(os.path.join(output_dir, 'figure_pipeline_profile.json'))
+    return aggregators
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the metagenomic figures from a single pass over the master table.')
+    parser.add_argument('figures', nargs='*', help=f"figures to build, among {', '.join(FIGURE_AGGREGATORS)} (default: all)")
+    parser.add_argument('--input', default=MASTER_TABLE_FILE, help='master table CSV')
+    parser.add_argument('--output-dir', default='.', help='folder for the summary CSVs and PDFs')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='rows handed to the aggregators at a time')
+    parser.add_argument('--streaming', action='store_true', help='read the table in chunks of --batch-size rows instead of loading it whole')
+    parser.add_argument('--no-cache', action='store_true', help='aggregate every figure again instead of reusing cached aggregates')
+    parser.add_argument('--profile', action='store_true', help='write a JSON report of the time and memory of every stage')
+    parser.add_argument(DATA_ONLY_FLAG, action='store_true', help='write the summary CSVs only, without rendering or importing matplotlib')
+    args = parser.parse_args()
+
+    unknown = [name for name in args.figures if name not in FIGURE_AGGREGATORS]
+    if unknown:
+        parser.error(f"unknown figures: {', '.join(unknown)}")
+
+    run_pipeline(args.figures, args.input, args.output_dir, args.batch_size, args.streaming, profiling_requested(),
+                 not args.no_cache, not data_only_requested())
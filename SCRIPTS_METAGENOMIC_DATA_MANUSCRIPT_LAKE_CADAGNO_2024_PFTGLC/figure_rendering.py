@@ -0,0 +1,190 @@
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from figure_definitions import (bathyarchaeia_color_map, cluster_order, cog_categories, element_color_map, group_colors,
+                                marker_genes, marker_genes_order, supercategories)
+from master_table_loader import DEPTH_COLUMNS
+
+
+def plot_taxonomic_groups(df_combined_normalized, pdf_path):
+    """Figure 1B: stacked bar plot of the RpS3 relative abundances per taxonomic group."""
+    # Display the samples in reverse order on the y-axis
+    sample_order = DEPTH_COLUMNS[::-1]
+    df_combined_normalized = df_combined_normalized[sample_order]
+
+    # Get the colors in the correct order for the selected groups and "Others"
+    colors_in_plot = [group_colors[group] for group in df_combined_normalized.index]
+
+    # Plotting the stacked bar plot
+    fig, ax = plt.subplots(figsize=(10, 7))
+    df_combined_normalized.T.plot(kind='barh', stacked=True, color=colors_in_plot, ax=ax)
+
+    # Labeling the axes
+    ax.set_xlabel("Relative Abundance")
+    ax.set_ylabel("Sample Depth (cm)")
+    ax.set_title("Figure 1B (Main Manuscript)-Relative abundances of RpS3 protein sequences  with depth")
+
+    # Move the legend outside the plot
+    ax.legend(loc='center left', bbox_to_anchor=(1.0, 0.5), title='Taxonomic Groups')
+
+    plt.savefig(pdf_path, bbox_inches='tight')
+    return fig
+
+
+def plot_bathyarchaeia_clusters(normalized_abundances, cluster_groups, pdf_path):
+    """Figure 3: bubble plot of the normalized Candidatus Bathyarchaeia cluster abundances."""
+    cm_columns = list(normalized_abundances.columns)
+
+    # Prepare the bubble plot
+    fig, ax = plt.subplots(figsize=(12, 8))
+
+    # Clusters of the table in the required order, with their x position and phylogenetic group
+    # (missing or invalid groups become 'Unknown')
+    clusters = [cluster for cluster in cluster_order if cluster in normalized_abundances.index]
+    positions = np.array([cluster_order.index(cluster) for cluster in clusters], dtype=int)
+    groups = np.array(['Unknown' if pd.isna(cluster_groups[cluster]) else cluster_groups[cluster] for cluster in clusters], dtype=object)
+
+    # One bubble per cluster and sample with a positive abundance, in cluster then sample order
+    abundances = normalized_abundances.loc[clusters, cm_columns].to_numpy(dtype=float)
+    rows, samples = np.nonzero(abundances > 0)
+    bubble_groups = groups[rows]
+    known = np.isin(bubble_groups, list(bathyarchaeia_color_map))
+    for taxonomic_group in bubble_groups[~known]:
+        print(f"Warning: Taxonomic group '{taxonomic_group}' not found in color_map.")
+
+    # Plot all bubbles with a single scatter call (adjust bubble size here)
+    if known.any():
+        ax.scatter(positions[rows[known]], samples[known], s=abundances[rows[known], samples[known]] * 5000,
+                   color=[bathyarchaeia_color_map[group] for group in bubble_groups[known]], alpha=0.6, edgecolor='black')
+
+    # Adjust x and y axis
+    ax.set_xticks(np.arange(len(cluster_order)))
+    ax.set_xticklabels(cluster_order, rotation=90)
+
+    # Move the x-axis ticks and labels to the top
+    ax.xaxis.tick_top()
+    ax.xaxis.set_label_position('top')
+
+    # Adjust y-axis with sample names
+    ax.set_yticks(np.arange(len(cm_columns)))
+    ax.set_yticklabels(cm_columns)
+
+    # Invert the y-axis to match the desired sample order
+    ax.invert_yaxis()
+
+    # Adjust bubble size legend
+    bubble_sizes = [0.001, 0.01, 0.05, 0.1, 0.2, 0.43]
+    bubble_legend = [plt.Line2D([0], [0], marker='o', color='w', markerfacecolor='gray', markersize=np.sqrt(size * 5000), alpha=0.6) for size in bubble_sizes]
+    bubble_labels = [str(size) for size in bubble_sizes]
+
+    # Add the bubble size legend
+    bubble_legend = ax.legend(bubble_legend, bubble_labels, title="Normalized abundance", bbox_to_anchor=(1.05, 1), loc='upper left')
+
+    # Add color legend for taxonomic groups
+    ax.legend([plt.Line2D([0], [0], marker='o', color='w', markerfacecolor=bathyarchaeia_color_map[element], markersize=10, alpha=0.6) for element in bathyarchaeia_color_map],
+              bathyarchaeia_color_map.keys(), title="Phylogenetic group", bbox_to_anchor=(1.05, 0.6), loc='upper left')
+
+    # Add bubble legend back to the plot
+    ax.add_artist(bubble_legend)
+
+    plt.savefig(pdf_path, bbox_inches='tight')
+    return fig
+
+
+def plot_cog_categories(normalized_abundance_df, pdf_path):
+    """Figure 4: stacked bar plot of the relative abundances of the COG categories and supercategories."""
+    # Define the color list for the plot based on the category and supercategory
+    colors = []
+    legend_labels = []
+
+    for category in normalized_abundance_df.index:
+        if category in cog_categories:
+            colors.append(cog_categories[category][1])
+            legend_labels.append(cog_categories[category][0])
+        else:
+            for supercat, data in supercategories.items():
+                if category == supercat:
+                    colors.append(data['color'])
+                    legend_labels.append(supercat)
+
+    # Plot the normalized stacked bar plot with the correct sample order and colors
+    ax = normalized_abundance_df.T.plot(kind='barh', stacked=True, figsize=(10, 8), color=colors)
+
+    plt.xlabel('Relative Abundance')
+    plt.ylabel('Sample Depth (cm)')
+    plt.title('Normalized Abundance of COG Categories and Supercategories by Sample')
+    plt.legend(legend_labels, title='COG Categories', bbox_to_anchor=(1.05, 1), loc='upper left')
+
+    # Invert the y-axis to match the desired sample order
+    plt.gca().invert_yaxis()
+
+    plt.savefig(pdf_path, bbox_inches='tight')
+    return ax.figure
+
+
+def plot_marker_genes(normalized_abundances, pdf_path):
+    """Figure 5: bubble plot of the marker gene abundances normalized by RpS3."""
+    cm_columns = list(normalized_abundances.columns)
+
+    # Prepare the bubble plot
+    fig, ax = plt.subplots(figsize=(12, 8))
+
+    # Plot bubbles for each marker gene and sample
+    for i, gene in enumerate(marker_genes_order):
+        for j, sample in enumerate(cm_columns):
+            abundance = normalized_abundances.loc[gene, sample]
+            if not np.isnan(abundance) and abundance > 0:
+                ax.scatter(i, j, s=abundance * 800, color=element_color_map[marker_genes[gene]], alpha=0.6, edgecolor='black')
+
+    # Adjust x and y axis
+    ax.set_xticks(np.arange(len(marker_genes_order)))
+    ax.set_xticklabels(marker_genes_order, rotation=90)
+
+    # Move the x-axis ticks and labels to the top
+    ax.xaxis.tick_top()
+    ax.xaxis.set_label_position('top')
+
+    # Adjust y-axis with sample names
+    ax.set_yticks(np.arange(len(cm_columns)))
+    ax.set_yticklabels(cm_columns)
+
+    # Invert the y-axis to match the desired sample order
+    ax.invert_yaxis()
+
+    # Adjust bubble size legend
+    bubble_sizes = [0.05, 0.1, 0.2, 0.3, 0.6, 0.8]
+    bubble_legend = [plt.Line2D([0], [0], marker='o', color='w', markerfacecolor='gray', markersize=np.sqrt(size * 800), alpha=0.6) for size in bubble_sizes]
+    bubble_labels = [str(size) for size in bubble_sizes]
+
+    # Add the bubble size legend
+    bubble_legend = ax.legend(bubble_legend, bubble_labels, title="Normalized marker gene abundance", bbox_to_anchor=(1.05, 1), loc='upper left')
+
+    # Add color legend for elements
+    ax.legend([plt.Line2D([0], [0], marker='o', color='w', markerfacecolor=element_color_map[element], markersize=10, alpha=0.6) for element in element_color_map],
+              element_color_map.keys(), title="Element", bbox_to_anchor=(1.05, 0.6), loc='upper left')
+
+    # Add bubble legend back to the plot
+    ax.add_artist(bubble_legend)
+
+    plt.savefig(pdf_path, bbox_inches='tight')
+    return fig
+
+
+def plot_depth_distances(distances, pdf_path, metric='braycurtis'):
+    """Heatmap of a depth x depth distance matrix, the shallowest depth first on both axes."""
+    fig, ax = plt.subplots(figsize=(8, 7))
+    image = ax.imshow(distances.to_numpy(dtype=float), cmap='viridis', vmin=0, vmax=1)
+
+    # Label both axes with the sample depths
+    ax.set_xticks(np.arange(len(distances.columns)))
+    ax.set_xticklabels(distances.columns, rotation=90)
+    ax.set_yticks(np.arange(len(distances.index)))
+    ax.set_yticklabels(distances.index)
+    ax.set_xlabel("Sample Depth (cm)")
+    ax.set_ylabel("Sample Depth (cm)")
+
+    fig.colorbar(image, ax=ax, label=f"{'Bray-Curtis' if metric == 'braycurtis' else 'Jaccard'} distance")
+
+    plt.savefig(pdf_path, bbox_inches='tight')
+    return fig
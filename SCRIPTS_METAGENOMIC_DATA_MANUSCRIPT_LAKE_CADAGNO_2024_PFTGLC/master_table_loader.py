@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+# Default name of the master table, as downloaded next to the figure scripts
+MASTER_TABLE_FILE = "MASTER_TABLE_METAGENOMIC_DATA_MANUSCRIPT_LAKE_CADAGNO_2024_PFTGLC.csv"
+
+# Depth columns in canonical (top to bottom) order
+DEPTH_COLUMNS = ["3_cm", "40_cm", "153_cm", "187_cm", "213_cm", "233_cm", "283_cm", "382_cm", "532_cm", "566_cm", "582_cm", "693_cm", "738_cm"]
+
+# Annotation columns used by the figure scripts to filter and group rows
+ANNOTATION_COLUMNS = [
+    "BLAST_taxonomic_annotation",
+    "Functional_annotation_short_blast_or_tree_placement",
+    "Assigned_ID_Candidatus_Bathyarchaeia_cluster",
+    "Taxonomic_assignment_Zhou_Hou_GDBTk_Ca_Bathyarchaeia",
+    "COG_category",
+]
+
+# Explicit dtype schema so pandas never has to guess column types
+DTYPE_SCHEMA = {column: "float64" for column in DEPTH_COLUMNS}
+DTYPE_SCHEMA.update({column: str for column in ANNOTATION_COLUMNS})
+
+# Default number of rows per chunk when streaming the master table
+CHUNK_SIZE = 500_000
+
+# Folder (next to the master table) holding the columnar cache
+CACHE_DIR_NAME = ".master_table_cache"
+
+
+def cache_dir_for(file_path):
+    """Return the cache folder next to a master table CSV."""
+    return os.path.join(os.path.dirname(os.path.abspath(file_path)), CACHE_DIR_NAME)
+
+
+def cache_path_for(file_path):
+    """Return the path of the Parquet cache belonging to a master table CSV."""
+    name = os.path.basename(file_path)
+    return os.path.join(cache_dir_for(file_path), os.path.splitext(name)[0] + ".parquet")
+
+
+def file_digest(file_path):
+    """Return the SHA-256 hex digest of a file's content.
+
+    The digest is remembered next to the cache together with the file's size and
+    modification time, so an unchanged multi-GB table is only hashed once.
+    """
+    memo_path = os.path.join(cache_dir_for(file_path), os.path.basename(file_path) + ".sha256.json")
+    stat = os.stat(file_path)
+    if os.path.exists(memo_path):
+        with open(memo_path) as memo_file:
+            memo = json.load(memo_file)
+        if memo["size"] == stat.st_size and memo["mtime_ns"] == stat.st_mtime_ns:
+            return memo["sha256"]
+
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as table_file:
+        for block in iter(lambda: table_file.read(1 << 20), b""):
+            digest.update(block)
+
+    os.makedirs(os.path.dirname(memo_path), exist_ok=True)
+    with open(memo_path, "w") as memo_file:
+        json.dump({"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest.hexdigest()}, memo_file)
+    return digest.hexdigest()
+
+
+def _cache_is_fresh(file_path, cache_path):
+    # The cache is only valid if it was written after the last change to the CSV
+    return os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(file_path)
+
+
+def _coerce_depths(df):
+    # Turn depth cells that are not plain numbers into NaN, like Figure 1B does
+    depth_columns = [column for column in df.columns if column in DEPTH_COLUMNS]
+    df[depth_columns] = df[depth_columns].apply(pd.to_numeric, errors="coerce")
+    return df
+
+
+def _read_csv(file_path, columns):
+    dtypes = {column: DTYPE_SCHEMA[column] for column in columns if column in DTYPE_SCHEMA}
+    try:
+        return pd.read_csv(file_path, usecols=columns, dtype=dtypes)
+    except ValueError:
+        # Some depth cells are not plain numbers: read them as text and coerce them
+        dtypes = {column: dtype for column, dtype in dtypes.items() if column not in DEPTH_COLUMNS}
+        return _coerce_depths(pd.read_csv(file_path, usecols=columns, dtype=dtypes))
+
+
+def _cached_columns(file_path):
+    # Every schema column present in the table is cached, so any figure can be served from the cache
+    header = pd.read_csv(file_path, nrows=0).columns
+    return [column for column in header if column in DTYPE_SCHEMA]
+
+
+def _write_cache(file_path, cache_path):
+    df = _read_csv(file_path, _cached_columns(file_path))
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = cache_path + ".tmp"
+    try:
+        df.to_parquet(tmp_path, index=False)
+    except ImportError:
+        # No Parquet engine (pyarrow) installed: run without a cache
+        return df
+    os.replace(tmp_path, cache_path)
+    return df
+
+
+def _with_depth_columns(columns):
+    return list(DEPTH_COLUMNS) + [column for column in columns if column not in DEPTH_COLUMNS]
+
+
+def load_master_table(columns=(), file_path=MASTER_TABLE_FILE, use_cache=True):
+    """Load the depth columns plus the requested annotation columns of the master table.
+
+    The first call writes a Parquet cache of all schema columns next to the CSV,
+    later calls read only the requested columns from that cache.
+    """
+    columns = _with_depth_columns(columns)
+
+    # Columns outside the schema are not cached, read them straight from the CSV
+    if not use_cache or any(column not in DTYPE_SCHEMA for column in columns):
+        return _read_csv(file_path, columns)
+
+    cache_path = cache_path_for(file_path)
+    if _cache_is_fresh(file_path, cache_path):
+        return pd.read_parquet(cache_path, columns=columns)
+
+    return _write_cache(file_path, cache_path)[columns]
+
+
+def _iter_csv(file_path, columns, chunksize):
+    # Depth columns are coerced chunk by chunk: a bad cell cannot be retried once earlier chunks are handed out
+    dtypes = {column: DTYPE_SCHEMA[column] for column in columns if column in DTYPE_SCHEMA and column not in DEPTH_COLUMNS}
+    for chunk in pd.read_csv(file_path, usecols=columns, dtype=dtypes, chunksize=chunksize):
+        yield _coerce_depths(chunk)
+
+
+def _iter_parquet(cache_path, columns, chunksize):
+    import pyarrow.parquet as pq
+
+    for batch in pq.ParquetFile(cache_path).iter_batches(batch_size=chunksize, columns=columns):
+        yield batch.to_pandas()
+
+
+def _iter_csv_writing_cache(file_path, columns, chunksize, cache_path):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        # No Parquet engine installed: stream the CSV without a cache
+        yield from _iter_csv(file_path, columns, chunksize)
+        return
+
+    # Explicit Arrow schema, so chunks where an annotation column is all empty still match
+    cached_columns = _cached_columns(file_path)
+    schema = pa.schema([(column, pa.float64() if column in DEPTH_COLUMNS else pa.string()) for column in cached_columns])
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = cache_path + ".tmp"
+    writer = pq.ParquetWriter(tmp_path, schema)
+    try:
+        for chunk in _iter_csv(file_path, cached_columns, chunksize):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield chunk[columns]
+    except BaseException:
+        # Includes the reader stopping early: never leave a partial cache behind
+        writer.close()
+        os.remove(tmp_path)
+        raise
+    writer.close()
+    os.replace(tmp_path, cache_path)
+
+
+def iter_master_table(columns=(), file_path=MASTER_TABLE_FILE, chunksize=CHUNK_SIZE, use_cache=True):
+    """Yield the depth columns plus the requested annotation columns in chunks of at most ``chunksize`` rows.
+
+    Only one chunk is held in memory at a time. Like ``load_master_table``, a missing
+    Parquet cache is written along the way and read from on later runs.
+    """
+    columns = _with_depth_columns(columns)
+
+    if not use_cache or any(column not in DTYPE_SCHEMA for column in columns):
+        yield from _iter_csv(file_path, columns, chunksize)
+        return
+
+    cache_path = cache_path_for(file_path)
+    if _cache_is_fresh(file_path, cache_path):
+        yield from _iter_parquet(cache_path, columns, chunksize)
+        return
+
+    yield from _iter_csv_writing_cache(file_path, columns, chunksize, cache_path)
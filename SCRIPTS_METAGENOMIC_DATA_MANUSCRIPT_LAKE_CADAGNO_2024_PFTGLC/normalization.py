@@ -0,0 +1,64 @@
+import os
+
+import pandas as pd
+
+from figure_definitions import FUNCTION_COLUMN
+from master_table_loader import DEPTH_COLUMNS, MASTER_TABLE_FILE, cache_dir_for, file_digest, iter_master_table
+
+# Single-copy marker used to normalize the abundances of Figures 3 and 5
+RPS3 = 'RpS3'
+
+
+def marker_totals_of(batch):
+    """Total abundance per sample of every functional annotation in a batch of master-table rows."""
+    return batch[DEPTH_COLUMNS].astype(float).groupby(batch[FUNCTION_COLUMN], observed=True).sum().rename_axis(None)
+
+
+def marker_totals_path(file_path):
+    # Keyed by the content of the master table, so an edited table never reuses stale totals
+    return os.path.join(cache_dir_for(file_path), f'marker_totals_{file_digest(file_path)}.csv')
+
+
+def load_marker_totals(file_path=MASTER_TABLE_FILE):
+    """Return the stored marker totals of a master table, or None if they were never computed."""
+    path = marker_totals_path(file_path)
+    if not os.path.exists(path):
+        return None
+    # Read the floats back exactly as they were written
+    return pd.read_csv(path, index_col=0, float_precision='round_trip')
+
+
+def save_marker_totals(file_path, totals):
+    path = marker_totals_path(file_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    totals.to_csv(path)
+
+
+def marker_totals(file_path=MASTER_TABLE_FILE):
+    """Return the per-sample totals of every functional annotation (RpS3 included) of a master table.
+
+    They are computed once per table content, streaming only the functional
+    annotation column, and read back from the cache afterwards.
+    """
+    totals = load_marker_totals(file_path)
+    if totals is None:
+        partials = [marker_totals_of(chunk) for chunk in iter_master_table([FUNCTION_COLUMN], file_path)]
+        totals = pd.concat(partials).groupby(level=0).sum() if partials else pd.DataFrame(columns=DEPTH_COLUMNS, dtype=float)
+        save_marker_totals(file_path, totals)
+    return totals
+
+
+def normalize(aggregate, by=RPS3, marker_totals=None):
+    """Divide every row of a group x sample table by a per-sample denominator.
+
+    ``by`` is either 'total' (the column sums of ``aggregate`` itself) or the name of
+    a marker in ``marker_totals``, such as 'RpS3'. A marker without any hit gives
+    a zero denominator.
+    """
+    if by == 'total':
+        denominator = aggregate.sum(axis=0)
+    elif marker_totals is None:
+        raise ValueError(f"marker totals are required to normalize by '{by}'")
+    else:
+        denominator = marker_totals.reindex([by], fill_value=0).iloc[0]
+    return aggregate.div(denominator[aggregate.columns], axis=1)
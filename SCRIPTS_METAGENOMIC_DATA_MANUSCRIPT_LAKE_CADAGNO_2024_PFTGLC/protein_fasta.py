@@ -0,0 +1,190 @@
+import argparse
+import mmap
+import os
+
+import numpy as np
+import pandas as pd
+
+# Protein sequences of the ORFs, relative to the metagenomic scripts
+FASTA_FILE = os.path.join('..', 'Supplementary_data', 'Supplementary_Data_1.faa')
+
+# ORF names such as SOL_1_10_cov_8.224951_N_5124: sample, contig number, contig coverage and ORF number
+HEADER_PATTERN = r'^(?P<sample>.+?)_(?P<contig>\d+)_cov_(?P<coverage>[0-9.eE+-]+)_N_(?P<orf>\d+)$'
+
+# Columns of the faidx index (.fai): name, sequence length, byte offset, residues and bytes per line
+INDEX_COLUMNS = ['name', 'length', 'offset', 'linebases', 'linewidth']
+
+# Bytes scanned at a time when looking for the record headers
+SCAN_BLOCK = 1 << 26
+
+
+def index_path_for(fasta_path):
+    return fasta_path + '.fai'
+
+
+def _header_starts(mm):
+    # Positions of the '>' opening a line, found block by block with NumPy
+    starts = []
+    for block_start in range(0, len(mm), SCAN_BLOCK):
+        block = np.frombuffer(mm, dtype=np.uint8, count=min(SCAN_BLOCK, len(mm) - block_start), offset=block_start)
+        positions = np.flatnonzero(block == ord('>'))
+        # A '>' opens a record when it follows a line break (or starts the file)
+        previous = block[np.maximum(positions - 1, 0)]
+        if len(positions) and positions[0] == 0:
+            previous[0] = ord('\n') if block_start == 0 else mm[block_start - 1]
+        starts.append(positions[previous == ord('\n')] + block_start)
+    return np.concatenate(starts) if starts else np.empty(0, dtype=np.int64)
+
+
+def _sequence_length(region, linebases, linewidth, ends_with_newline):
+    # Residues in a record of fixed-width lines: the region minus the line endings
+    eol = linewidth - linebases
+    n_lines = -(-region // linewidth)
+    return region - (n_lines if ends_with_newline else n_lines - 1) * eol
+
+
+def byte_spans(length, linebases, linewidth):
+    """Bytes taken by sequences of ``length`` residues from their offset, line breaks inside included.
+
+    Works on single records and on NumPy arrays of records alike.
+    """
+    n_lines = -(-length // np.maximum(linebases, 1))
+    return length + np.maximum(n_lines - 1, 0) * (linewidth - linebases)
+
+
+def _check_line_widths(mm, name, offset, end, linewidth):
+    # Every line of the record but its last must take linewidth bytes, and the last no more
+    if end - offset <= linewidth:
+        return
+    region = np.frombuffer(mm, dtype=np.uint8, count=end - offset, offset=offset)
+    line_ends = np.flatnonzero(region == ord('\n')) + 1
+    # The view must be gone before raising, or the memory map cannot be closed
+    del region
+    if line_ends[-1] < end - offset:
+        line_ends = np.append(line_ends, end - offset)
+    widths = np.diff(line_ends, prepend=0)
+    if (widths[:-1] != linewidth).any() or widths[-1] > linewidth:
+        raise ValueError(f"different line widths in sequence '{name}' of the FASTA file")
+
+
+def build_fasta_index(fasta_path=FASTA_FILE):
+    """Write the faidx index (``<fasta>.fai``, as ``samtools faidx`` does) of a FASTA file and return it.
+
+    Every record needs lines of the same width, except its last one (ValueError otherwise).
+    """
+    rows = []
+    with open(fasta_path, 'rb') as fasta_file, mmap.mmap(fasta_file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        starts = _header_starts(mm)
+        for start, end in zip(starts, np.append(starts[1:], len(mm))):
+            start, end = int(start), int(end)
+            header_end = mm.find(b'\n', start, end)
+            header_end = end if header_end == -1 else header_end
+            name = mm[start + 1:header_end].split()[0].decode()
+            offset = min(header_end + 1, end)
+
+            # The first sequence line gives the line width of the record
+            line_end = mm.find(b'\n', offset, end)
+            if line_end == -1:
+                linebases = linewidth = end - offset
+            else:
+                linebases = line_end - offset - (mm[line_end - 1] == ord('\r'))
+                linewidth = line_end - offset + 1
+                _check_line_widths(mm, name, offset, end, linewidth)
+            region = end - offset
+            length = _sequence_length(region, linebases, linewidth, region > 0 and mm[end - 1] == ord('\n')) if region else 0
+            rows.append((name, length, offset, linebases, linewidth))
+
+    index = pd.DataFrame(rows, columns=INDEX_COLUMNS)
+    tmp_path = index_path_for(fasta_path) + '.tmp'
+    index.to_csv(tmp_path, sep='\t', header=False, index=False)
+    os.replace(tmp_path, index_path_for(fasta_path))
+    return index
+
+
+def load_fasta_index(fasta_path=FASTA_FILE):
+    """Read the faidx index of a FASTA file, building it first if it is missing or older than the file."""
+    index_path = index_path_for(fasta_path)
+    if not os.path.exists(index_path) or os.path.getmtime(index_path) < os.path.getmtime(fasta_path):
+        return build_fasta_index(fasta_path)
+    return pd.read_csv(index_path, sep='\t', header=None, names=INDEX_COLUMNS, dtype={'name': str})
+
+
+def parse_headers(names):
+    """Split ORF names into sample, contig, coverage and ORF number columns (NaN where a name does not match)."""
+    names = pd.Series(names, dtype=object)
+    table = names.str.extract(HEADER_PATTERN)
+    table.insert(0, 'id', names)
+    table['contig'] = pd.to_numeric(table['contig']).astype('Int64')
+    table['coverage'] = pd.to_numeric(table['coverage'])
+    table['orf'] = pd.to_numeric(table['orf']).astype('Int64')
+    return table
+
+
+class ProteinFasta:
+    """Random access by ID to the sequences of a FASTA file, through its faidx index and a memory map.
+
+    Only the index is held in memory; a sequence is read from the mapped file when asked for.
+    """
+
+    def __init__(self, fasta_path=FASTA_FILE):
+        self.fasta_path = fasta_path
+        self.index = load_fasta_index(fasta_path)
+        self._positions = pd.Index(self.index['name'])
+        self._file = open(fasta_path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(fasta_path) else b''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._file.close()
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, name):
+        return name in self._positions
+
+    def _record(self, name):
+        position = self._positions.get_loc(name)
+        if not isinstance(position, (int, np.integer)):
+            raise KeyError(f"duplicate sequence name: {name}")
+        return self.index.iloc[position]
+
+    def fetch(self, name):
+        """Sequence of ``name``, without line breaks (KeyError if absent)."""
+        record = self._record(name)
+        length, offset, linebases, linewidth = (int(record[column]) for column in INDEX_COLUMNS[1:])
+        raw = self._mm[offset:offset + int(byte_spans(length, linebases, linewidth))]
+        return raw.replace(b'\r', b'').replace(b'\n', b'').decode('ascii')
+
+    def fetch_many(self, names):
+        """Sequences of several IDs, as a Series indexed by ID."""
+        names = list(names)
+        return pd.Series([self.fetch(name) for name in names], index=names, dtype=object)
+
+    def headers(self):
+        """Columnar table of every record: ID, sample, contig, coverage, ORF number and sequence length."""
+        table = parse_headers(self.index['name'])
+        table['length'] = self.index['length'].to_numpy()
+        return table
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Random access to the protein sequences of a FASTA file by ORF ID.')
+    parser.add_argument('ids', nargs='*', help='ORF IDs to print as FASTA')
+    parser.add_argument('--fasta', default=FASTA_FILE, help='protein FASTA file')
+    parser.add_argument('--headers', help='write the parsed headers (sample, contig, coverage, ORF, length) to this CSV')
+    args = parser.parse_args()
+
+    with ProteinFasta(args.fasta) as fasta:
+        if args.headers:
+            fasta.headers().to_csv(args.headers, index=False)
+            print(f"{len(fasta)} headers saved to {args.headers}")
+        for orf_id in args.ids:
+            print(f">{orf_id}\n{fasta.fetch(orf_id)}")
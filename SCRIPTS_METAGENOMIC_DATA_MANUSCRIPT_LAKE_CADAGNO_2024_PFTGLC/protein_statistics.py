@@ -0,0 +1,127 @@
+import argparse
+import mmap
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from protein_fasta import FASTA_FILE, INDEX_COLUMNS, byte_spans, load_fasta_index, parse_headers
+
+# The 20 standard amino acids, then the stop and the ambiguous residues; anything else counts as 'other'
+AMINO_ACIDS = list('ACDEFGHIKLMNPQRSTVWY')
+STOP = '*'
+AMBIGUOUS = list('XBZJ')
+RESIDUE_CLASSES = AMINO_ACIDS + ['stop', 'ambiguous', 'other']
+
+# Records handed to a worker at a time
+BATCH_RECORDS = 20_000
+
+
+def _residue_lookup():
+    # Byte value -> residue class, upper and lower case alike
+    lookup = np.full(256, RESIDUE_CLASSES.index('other'), dtype=np.int32)
+    for residue in AMINO_ACIDS:
+        lookup[ord(residue)] = lookup[ord(residue.lower())] = RESIDUE_CLASSES.index(residue)
+    lookup[ord(STOP)] = RESIDUE_CLASSES.index('stop')
+    for residue in AMBIGUOUS:
+        lookup[ord(residue)] = lookup[ord(residue.lower())] = RESIDUE_CLASSES.index('ambiguous')
+    return lookup
+
+
+RESIDUE_LOOKUP = _residue_lookup()
+
+
+def residue_counts(fasta_path, offsets, spans, lengths):
+    """Residue class counts (records x ``RESIDUE_CLASSES``) of a batch of consecutive records.
+
+    The bytes of the whole batch are taken from the memory map as one buffer; the
+    sequence bytes are picked out with a mask (headers and line breaks dropped) and
+    counted with a single ``np.bincount`` over (record, residue class) pairs.
+    """
+    n_records = len(offsets)
+    if n_records == 0 or lengths.sum() == 0:
+        return np.zeros((n_records, len(RESIDUE_CLASSES)), dtype=np.int64)
+
+    base, stop = int(offsets[0]), int(offsets[-1] + spans[-1])
+    with open(fasta_path, 'rb') as fasta_file, mmap.mmap(fasta_file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        view = np.frombuffer(mm, dtype=np.uint8, count=stop - base, offset=base)
+        buffer = view.copy()
+        del view
+
+    # Bytes inside a sequence span, then without the line breaks
+    inside = np.zeros(len(buffer) + 1, dtype=np.int8)
+    np.add.at(inside, offsets - base, 1)
+    np.add.at(inside, offsets - base + spans, -1)
+    keep = (np.cumsum(inside[:-1], dtype=np.int8) > 0) & (buffer != ord('\n')) & (buffer != ord('\r'))
+    residues = RESIDUE_LOOKUP[buffer[keep]]
+    if len(residues) != lengths.sum():
+        raise ValueError(f"{fasta_path} changed since it was indexed, remove its .fai index")
+
+    # One bin per (record, residue class) pair
+    bins = np.repeat(np.arange(n_records, dtype=np.int32) * len(RESIDUE_CLASSES), lengths) + residues
+    counts = np.bincount(bins, minlength=n_records * len(RESIDUE_CLASSES))
+    return counts.reshape(n_records, len(RESIDUE_CLASSES))
+
+
+def _batch_features(fasta_path, index):
+    lengths = index['length'].to_numpy(dtype=np.int64)
+    offsets = index['offset'].to_numpy(dtype=np.int64)
+    spans = byte_spans(lengths, index['linebases'].to_numpy(dtype=np.int64), index['linewidth'].to_numpy(dtype=np.int64))
+    counts = residue_counts(fasta_path, offsets, spans, lengths)
+
+    features = parse_headers(index['name'])
+    features['length'] = lengths
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fractions = counts / lengths[:, None]
+    for k, residue_class in enumerate(RESIDUE_CLASSES):
+        features[f'frac_{residue_class}'] = fractions[:, k]
+    return features
+
+
+def sequence_features(fasta_path=FASTA_FILE, batch_records=BATCH_RECORDS, workers=None):
+    """Per-sequence feature table of a protein FASTA file, computed in one streaming pass.
+
+    One row per ORF: ID, sample, contig, coverage and ORF number (parsed from the name),
+    length, and the fraction of each amino acid (``frac_A`` ...), of stops (``frac_stop``),
+    of ambiguous residues (X, B, Z, J, ``frac_ambiguous``) and of anything else
+    (``frac_other``). Records are processed ``batch_records`` at a time, in a pool of
+    ``workers`` processes when more than one is asked for.
+    """
+    index = load_fasta_index(fasta_path)
+    batches = [index.iloc[start:start + batch_records] for start in range(0, len(index), batch_records)]
+    if workers and workers > 1 and len(batches) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_batch_features, [fasta_path] * len(batches), batches))
+    else:
+        parts = [_batch_features(fasta_path, batch) for batch in batches]
+    if not parts:
+        return _batch_features(fasta_path, pd.DataFrame(columns=INDEX_COLUMNS))
+    return pd.concat(parts, ignore_index=True)
+
+
+def summarize_by_sample(features):
+    """Coverage-weighted means of the length and of every fraction of the feature table, per sample."""
+    value_columns = ['length'] + [column for column in features.columns if column.startswith('frac_')]
+    weights = features['coverage'].fillna(0)
+    weighted = features[value_columns].mul(weights, axis=0).groupby(features['sample']).sum()
+    total_coverage = weights.groupby(features['sample']).sum()
+
+    summary = weighted.div(total_coverage, axis=0)
+    summary.insert(0, 'total_coverage', total_coverage)
+    summary.insert(0, 'n_sequences', features.groupby('sample').size())
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Per-sequence length and composition statistics of a protein FASTA file.')
+    parser.add_argument('--fasta', default=FASTA_FILE, help='protein FASTA file')
+    parser.add_argument('--output', default='protein_sequence_features.csv', help='per-sequence feature table (CSV)')
+    parser.add_argument('--summary', default='protein_features_by_sample.csv', help='coverage-weighted summary per sample (CSV)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_RECORDS, help='records per batch')
+    parser.add_argument('--workers', type=int, help='worker processes (default: none, one batch after the other)')
+    args = parser.parse_args()
+
+    features = sequence_features(args.fasta, args.batch_size, args.workers)
+    features.to_csv(args.output, index=False)
+    summarize_by_sample(features).to_csv(args.summary)
+    print(f"Features of {len(features)} sequences saved to {args.output}, per-sample summary to {args.summary}")
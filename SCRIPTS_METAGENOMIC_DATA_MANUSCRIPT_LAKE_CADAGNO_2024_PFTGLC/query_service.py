@@ -0,0 +1,252 @@
+import argparse
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from compact_table import CompactMasterTable
+from figure_aggregators import FIGURE_AGGREGATORS
+from figure_definitions import FUNCTION_COLUMN
+from figure_pipeline import iter_batches
+from master_table_loader import ANNOTATION_COLUMNS, MASTER_TABLE_FILE
+from normalization import RPS3, normalize
+
+# Figures are rendered headlessly, and only when one is asked for
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+# The service only listens on the local machine
+HOST = '127.0.0.1'
+PORT = 8765
+
+# Answers kept for repeated queries
+CACHE_SIZE = 256
+
+NORMALIZATIONS = [None, RPS3, 'total']
+
+
+class QueryCache:
+    """Thread-safe LRU cache of query answers, keyed on the canonical form of the query."""
+
+    def __init__(self, max_size=CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+class QueryEngine:
+    """Aggregate queries over a master table loaded once as a ``CompactMasterTable``.
+
+    The table is never modified after loading, so any number of threads can read it
+    at once; only rendering, which goes through matplotlib's global state, is serialized.
+    """
+
+    def __init__(self, table, cache_size=CACHE_SIZE):
+        self.table = table
+        # Per-sample totals of every functional annotation, the denominators of the RpS3 normalization
+        self.marker_totals = table.group_sums(FUNCTION_COLUMN) if FUNCTION_COLUMN in table.annotations else None
+        self.cache = QueryCache(cache_size)
+        self._render_lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, file_path=MASTER_TABLE_FILE, cache_size=CACHE_SIZE):
+        # float64 depths, so the sums match those of the figure scripts
+        return cls(CompactMasterTable.load(ANNOTATION_COLUMNS, file_path, dtype=np.float64), cache_size)
+
+    def _column(self, column):
+        if column not in self.table.annotations:
+            raise ValueError(f"unknown column '{column}', expected one of {', '.join(self.table.annotations)}")
+        return column
+
+    def columns(self):
+        """Annotation columns with their number of distinct values."""
+        return {column: len(values.categories) for column, values in self.table.annotations.items()}
+
+    def values(self, column):
+        """Distinct values of an annotation column."""
+        return list(self.table.annotations[self._column(column)].categories.astype(str))
+
+    def aggregate(self, group_by, filters=None, contains=None, normalize_by=None):
+        """Group x depth sums of the rows passing the filters, optionally normalized.
+
+        ``filters`` maps columns to the values to keep, ``contains`` maps columns to a
+        substring (case-insensitive) the values must contain; all conditions must
+        hold. ``normalize_by`` is None, 'RpS3' or 'total', as in normalization.py.
+        """
+        if normalize_by not in NORMALIZATIONS:
+            raise ValueError(f"unknown normalization '{normalize_by}', expected RpS3 or total")
+        mask = np.ones(len(self.table), dtype=bool)
+        for column, values in (filters or {}).items():
+            mask &= self.table.isin(self._column(column), values)
+        for column, substring in (contains or {}).items():
+            mask &= self.table.contains(self._column(column), substring)
+
+        sums = self.table.group_sums(self._column(group_by), mask)
+        if normalize_by is None:
+            return sums
+        return normalize(sums, normalize_by, self.marker_totals)
+
+    def query(self, query):
+        """Answer a JSON aggregate query, from the cache when the same query was answered before."""
+        query = _checked_query(query)
+        key = json.dumps(query, sort_keys=True)
+        answer = self.cache.get(key)
+        if answer is None:
+            result = self.aggregate(query['group_by'], query.get('filters'), query.get('contains'), query.get('normalize'))
+            # NaN (a zero denominator) is not valid JSON, it is sent as null
+            values = result.to_numpy(dtype=float)
+            answer = {'index': [str(label) for label in result.index], 'columns': list(result.columns),
+                      'data': np.where(np.isnan(values), None, values).tolist()}
+            self.cache.put(key, answer)
+        return answer
+
+    def figure(self, name):
+        """PDF bytes of one of the figures, aggregated from the loaded table."""
+        if name not in FIGURE_AGGREGATORS:
+            raise ValueError(f"unknown figure '{name}', expected one of {', '.join(FIGURE_AGGREGATORS)}")
+        key = f'figure:{name}'
+        pdf = self.cache.get(key)
+        if pdf is None:
+            aggregator = FIGURE_AGGREGATORS[name]()
+            for batch in iter_batches(self.table):
+                aggregator.update(batch)
+            aggregator.marker_totals = self.marker_totals
+
+            with self._render_lock, tempfile.TemporaryDirectory() as output_dir:
+                import matplotlib.pyplot as plt
+                plt.close(aggregator.render(output_dir))
+                with open(os.path.join(output_dir, aggregator.pdf_file), 'rb') as pdf_file:
+                    pdf = pdf_file.read()
+            self.cache.put(key, pdf)
+        return pdf
+
+
+def _checked_query(query):
+    # A JSON query, checked before it reaches the table: a filter value given as one string is a list of one value
+    if not isinstance(query, dict):
+        raise ValueError('a query must be a JSON object')
+    unknown = set(query) - {'group_by', 'filters', 'contains', 'normalize'}
+    if unknown or 'group_by' not in query:
+        raise ValueError(f"a query needs 'group_by' and may have 'filters', 'contains' and 'normalize' "
+                         f"(got {', '.join(sorted(query))})")
+    if not isinstance(query['group_by'], str):
+        raise ValueError("'group_by' must be a column name")
+    filters, contains = query.get('filters') or {}, query.get('contains') or {}
+    if not isinstance(filters, dict) or not isinstance(contains, dict):
+        raise ValueError("'filters' and 'contains' must map column names to values")
+    filters = {column: [values] if isinstance(values, str) else values for column, values in filters.items()}
+    for column, values in filters.items():
+        if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+            raise ValueError(f"filter values of '{column}' must be a string or a list of strings")
+    for column, substring in contains.items():
+        if not isinstance(substring, str):
+            raise ValueError(f"'contains' value of '{column}' must be a string")
+    return dict(query, filters=filters, contains=contains)
+
+
+def _query_from_parameters(parameters):
+    # GET form: group_by=, normalize=, <column>=<value> (repeatable) and contains.<column>=<substring>
+    query = {'filters': {}, 'contains': {}}
+    for name, values in parameters.items():
+        if name in ('group_by', 'normalize'):
+            query[name] = values[-1]
+        elif name.startswith('contains.'):
+            query['contains'][name[len('contains.'):]] = values[-1]
+        else:
+            query['filters'][name] = sorted(values)
+    return {name: value for name, value in query.items() if value}
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """HTTP front end of a ``QueryEngine`` (set as the ``engine`` attribute of the server).
+
+    GET /columns, GET /values?column=..., GET or POST /aggregate, GET /figure/<name>.
+    """
+
+    def _send(self, status, body, content_type='application/json'):
+        if content_type == 'application/json':
+            body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _answer(self, path, parameters, body=None):
+        engine = self.server.engine
+        try:
+            if path == '/columns':
+                return self._send(200, engine.columns())
+            if path == '/values':
+                return self._send(200, engine.values(parameters.get('column', [''])[-1]))
+            if path == '/aggregate':
+                return self._send(200, engine.query(body if body is not None else _query_from_parameters(parameters)))
+            if path.startswith('/figure/'):
+                return self._send(200, engine.figure(path[len('/figure/'):]), 'application/pdf')
+            if path == '/cache':
+                return self._send(200, {'hits': engine.cache.hits, 'misses': engine.cache.misses})
+        except (ValueError, KeyError, TypeError) as error:
+            return self._send(400, {'error': str(error)})
+        self._send(404, {'error': f'no such endpoint: {path}'})
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        self._answer(url.path, parse_qs(url.query))
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        except json.JSONDecodeError as error:
+            return self._send(400, {'error': f'invalid JSON: {error}'})
+        self._answer(url.path, parse_qs(url.query), body)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def serve(engine, host=HOST, port=PORT, quiet=False):
+    """Create the threaded HTTP server of a query engine (call ``serve_forever`` on it to run it)."""
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    server.engine = engine
+    server.quiet = quiet
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local HTTP/JSON service answering aggregate queries over the master table.')
+    parser.add_argument('--input', default=MASTER_TABLE_FILE, help='master table CSV')
+    parser.add_argument('--port', type=int, default=PORT, help='port on 127.0.0.1')
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE, help='answers kept for repeated queries')
+    parser.add_argument('--quiet', action='store_true', help='do not log every request')
+    args = parser.parse_args()
+
+    engine = QueryEngine.from_file(args.input, args.cache_size)
+    server = serve(engine, HOST, args.port, args.quiet)
+    print(f"Serving {len(engine.table)} rows ({engine.table.nbytes / 1e6:.1f} MB) on http://{HOST}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
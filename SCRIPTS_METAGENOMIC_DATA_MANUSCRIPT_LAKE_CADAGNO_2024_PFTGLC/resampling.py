@@ -0,0 +1,203 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from figure_definitions import FUNCTION_COLUMN, marker_genes
+from master_table_loader import DEPTH_COLUMNS, MASTER_TABLE_FILE, load_master_table
+from normalization import RPS3
+
+# Iterations drawn at a time, which bounds the memory of a task
+BATCH_ITERATIONS = 250
+
+# Default seed: every task gets its own child seed, so results do not depend on the number of workers
+DEFAULT_SEED = 0
+
+
+def _run(function, tasks, workers):
+    # Tasks in a process pool when more than one worker is asked for, in order either way
+    if workers and workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(function, *zip(*tasks)))
+    return [function(*task) for task in tasks]
+
+
+def _seeds(seed, n_tasks):
+    return np.random.SeedSequence(seed).spawn(n_tasks)
+
+
+def _quantiles(draws, ci):
+    return np.quantile(draws, [(1 - ci) / 2, (1 + ci) / 2], axis=0)
+
+
+def _first_read_ranks(counts, n_iterations, rng):
+    # Position of the first read of every OTU in random orderings of the reads of one sample, one row per ordering.
+    # Each read gets a uniform key and is placed by it. The smallest key of an OTU of c reads is Beta(1, c); the
+    # keys not placed yet are uniform above the last smallest key met, so the number of them falling before the
+    # next one is binomial. One binomial draw per OTU, for all the orderings at once
+    minima = rng.beta(1, counts, size=(n_iterations, len(counts)))
+    order = np.argsort(minima, axis=1)
+    minima = np.take_along_axis(minima, order, axis=1)
+    other_reads = counts[order] - 1
+    ranks = np.empty(minima.shape, dtype=np.int64)
+    placed = np.zeros(n_iterations, dtype=np.int64)
+    pending = np.zeros(n_iterations, dtype=np.int64)
+    previous = np.zeros(n_iterations)
+    for k in range(len(counts)):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            fraction = np.nan_to_num((minima[:, k] - previous) / (1 - previous))
+        between = rng.binomial(pending, np.clip(fraction, 0, 1))
+        ranks[:, k] = placed + between
+        placed += between + 1
+        pending += other_reads[:, k] - between
+        previous = minima[:, k]
+    return ranks
+
+
+def _rarefy(counts, depths, n_iterations, seed):
+    # Observed OTUs in subsamples without replacement of one sample: the subsample of depth d is the first d reads
+    # of a random ordering, so an OTU is observed when its first read comes before position d
+    rng = np.random.default_rng(seed)
+    counts = counts[counts > 0]
+    depths = np.asarray(depths)
+    richness = np.full((len(depths), 2), np.nan)
+    valid = depths <= counts.sum()
+    if not valid.any():
+        return richness
+    observed = np.concatenate([(_first_read_ranks(counts, min(BATCH_ITERATIONS, n_iterations - start), rng)[:, :, None]
+                                < depths[valid]).sum(axis=1)
+                               for start in range(0, n_iterations, BATCH_ITERATIONS)])
+    richness[valid] = np.column_stack([observed.mean(axis=0), observed.std(axis=0)])
+    return richness
+
+
+def rarefaction_curves(counts_df, depths=None, n_iterations=100, seed=DEFAULT_SEED, workers=None):
+    """Rarefaction curves of an OTU x sample count table.
+
+    Every sample (column) is subsampled ``n_iterations`` times without replacement at
+    each depth (default: 20 steps up to the largest sample); returns the mean and the
+    standard deviation of the observed OTU count as two depth x sample tables. Depths
+    beyond the size of a sample are NaN. An iteration draws one random ordering of the
+    reads and takes its first reads at every depth, so its cost does not grow with the
+    number of depths.
+    """
+    counts = counts_df.to_numpy(dtype=np.int64)
+    if depths is None:
+        depths = np.unique(np.linspace(0, counts.sum(axis=0).max(), 21).astype(np.int64)[1:])
+    tasks = [(counts[:, j], depths, n_iterations, seed_j) for j, seed_j in enumerate(_seeds(seed, counts.shape[1]))]
+    curves = np.stack(_run(_rarefy, tasks, workers), axis=1)
+    index = pd.Index(depths, name='reads')
+    return (pd.DataFrame(curves[:, :, 0], index=index, columns=counts_df.columns),
+            pd.DataFrame(curves[:, :, 1], index=index, columns=counts_df.columns))
+
+
+def _bootstrap_proportions(totals, n_iterations, ci, seed):
+    # Multinomial resamples of the reads of one sample, already summed per group
+    rng = np.random.default_rng(seed)
+    n_reads = totals.sum()
+    if n_reads == 0:
+        return np.zeros((2, len(totals)))
+    draws = np.concatenate([rng.multinomial(n_reads, totals / n_reads, size=min(BATCH_ITERATIONS, n_iterations - start))
+                            for start in range(0, n_iterations, BATCH_ITERATIONS)])
+    return _quantiles(draws / n_reads, ci)
+
+
+def bootstrap_relative_abundance(aggregate_df, n_iterations=1000, ci=0.95, seed=DEFAULT_SEED, workers=None):
+    """Bootstrap intervals of the relative abundances of a group x sample count table.
+
+    The reads of every sample are resampled with replacement. The group totals of a
+    multinomial resample of the reads are themselves multinomial over the groups, so
+    drawing at the group level, as done here, is exact and independent of the number
+    of OTUs. Returns the lower and upper bounds of the ``ci`` interval as two tables
+    shaped like ``aggregate_df``.
+    """
+    totals = aggregate_df.to_numpy(dtype=np.int64)
+    tasks = [(totals[:, j], n_iterations, ci, seed_j) for j, seed_j in enumerate(_seeds(seed, totals.shape[1]))]
+    bounds = np.stack(_run(_bootstrap_proportions, tasks, workers), axis=2)
+    return (pd.DataFrame(bounds[0], index=aggregate_df.index, columns=aggregate_df.columns),
+            pd.DataFrame(bounds[1], index=aggregate_df.index, columns=aggregate_df.columns))
+
+
+def _bootstrap_ratios(values, groups, n_groups, is_marker, n_rows, n_iterations, seed):
+    # Rows of the whole table resampled with replacement: the weights of the rows that matter
+    # (plus one bucket for all the others) are one multinomial draw per iteration
+    rng = np.random.default_rng(seed)
+    probabilities = np.append(np.full(len(values), 1 / n_rows), 1 - len(values) / n_rows)
+    weights = rng.multinomial(n_rows, np.clip(probabilities, 0, None), size=n_iterations)[:, :-1].astype(float)
+
+    denominator = weights[:, is_marker] @ values[is_marker]
+    ratios = np.empty((n_iterations, n_groups, values.shape[1]))
+    for group in range(n_groups):
+        rows = groups == group
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ratios[:, group] = (weights[:, rows] @ values[rows]) / denominator
+    return ratios
+
+
+def bootstrap_marker_genes(file_path=MASTER_TABLE_FILE, n_iterations=1000, ci=0.95, seed=DEFAULT_SEED, workers=None):
+    """Bootstrap intervals of the Figure 5 marker gene abundances normalized by RpS3.
+
+    The ORFs (rows) of the master table are resampled with replacement and the
+    ratio of every marker gene to RpS3 is recomputed for every depth. Returns the
+    lower and upper bounds as two gene x depth tables.
+    """
+    df = load_master_table([FUNCTION_COLUMN], file_path)
+    genes = list(marker_genes)
+    rows = df[df[FUNCTION_COLUMN].isin(genes + [RPS3])]
+    values = rows[DEPTH_COLUMNS].astype(float).fillna(0).to_numpy()
+    groups = pd.Index(genes).get_indexer(rows[FUNCTION_COLUMN])
+    is_marker = (rows[FUNCTION_COLUMN] == RPS3).to_numpy()
+
+    batches = [min(BATCH_ITERATIONS, n_iterations - start) for start in range(0, n_iterations, BATCH_ITERATIONS)]
+    tasks = [(values, groups, len(genes), is_marker, len(df), size, seed_i) for size, seed_i in zip(batches, _seeds(seed, len(batches)))]
+    lower, upper = _quantiles(np.concatenate(_run(_bootstrap_ratios, tasks, workers)), ci)
+    return (pd.DataFrame(lower, index=genes, columns=DEPTH_COLUMNS),
+            pd.DataFrame(upper, index=genes, columns=DEPTH_COLUMNS))
+
+
+def _otu_modules():
+    # The 16S scripts live in their own folder next to this one
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                                 'SCRIPTS_TARGETED_16_SEQUENCING_DATA_MANUSCRIPT_LAKE_CADAGNO_2024_PFTGLC'))
+    import otu_barplot
+    return otu_barplot
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rarefaction curves and bootstrap intervals of the OTU and marker gene abundances.')
+    parser.add_argument('analysis', choices=['otu', 'rarefaction', 'marker-genes'],
+                        help='bootstrap the OTU group abundances, rarefy the OTU table, or bootstrap the Figure 5 values')
+    parser.add_argument('--input', help='OTU table or master table CSV (default: the ones of the figure scripts)')
+    parser.add_argument('--iterations', type=int, default=1000, help='resamples (rarefaction: per depth)')
+    parser.add_argument('--ci', type=float, default=0.95, help='confidence level of the intervals')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--workers', type=int, help='worker processes (default: none)')
+    parser.add_argument('--plot', help='OTU bootstrap: also save the OTU barplot with error bars to this PDF')
+    parser.add_argument('--output-prefix', default=None, help='prefix of the output CSVs')
+    args = parser.parse_args()
+
+    if args.analysis == 'marker-genes':
+        prefix = args.output_prefix or 'Figure_5_marker_genes_bootstrap'
+        lower, upper = bootstrap_marker_genes(args.input or MASTER_TABLE_FILE, args.iterations, args.ci, args.seed, args.workers)
+    else:
+        otu_barplot = _otu_modules()
+        otu_df = otu_barplot.load_otu_table(args.input or os.path.join(os.path.dirname(otu_barplot.__file__), otu_barplot.OTU_TABLE_FILE))
+        if args.analysis == 'rarefaction':
+            prefix = args.output_prefix or 'OTU_97_rarefaction'
+            sample_columns = [column for column in otu_df.columns if '_cm' in column]
+            lower, upper = rarefaction_curves(otu_df[sample_columns], n_iterations=args.iterations, seed=args.seed, workers=args.workers)
+        else:
+            prefix = args.output_prefix or 'OTU_97_bootstrap'
+            abundance_df = otu_barplot.aggregate_otu_table(otu_df)
+            lower, upper = bootstrap_relative_abundance(abundance_df, args.iterations, args.ci, args.seed, args.workers)
+            if args.plot:
+                otu_barplot.plot_relative_abundance(abundance_df, args.plot, intervals=(lower, upper))
+
+    # Rarefaction writes the mean and standard deviation, the bootstraps the interval bounds
+    names = ('mean', 'std') if args.analysis == 'rarefaction' else ('lower', 'upper')
+    for name, table in zip(names, (lower, upper)):
+        table.to_csv(f'{prefix}_{name}.csv')
+    print(f"Results saved to {prefix}_{names[0]}.csv and {prefix}_{names[1]}.csv")
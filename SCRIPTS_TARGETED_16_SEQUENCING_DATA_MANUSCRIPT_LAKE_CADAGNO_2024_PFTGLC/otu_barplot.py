@@ -0,0 +1,151 @@
+import os
+import sys
+
+import pandas as pd
+
+from taxonomy_classifier import TaxonomyClassifier
+
+# Sample labels are read the same way as in the metagenomic scripts
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from sample_depths import depth_of  # noqa: E402
+
+# Input OTU table and output files of the 16S figure
+OTU_TABLE_FILE = 'REAL0.97__complete_otu_table_qiime_Cara_Classification_97_identity.csv'
+OUTPUT_CSV_FILE = 'OTU_97_aggregated_abundance.csv'
+OUTPUT_PDF_FILE = 'OTU_97_relative_abundance_plot.pdf'
+
+# Define the list of sample columns and ensure they follow the specified order
+sample_order = ['3_cm', '40_cm', '153_cm', '187_cm', '213_cm', '233_cm', '283_cm', '382_cm', '532_cm', '566_cm', '582_cm', '693_cm', '738_cm']
+sample_order = [s.replace("_cm", "cm") for s in sample_order]  # Adjust format to match the previous usage
+
+# List of taxonomic groups and their corresponding matching strings
+taxonomic_groups = {
+    'Candidatus Bathyarchaeia': ['crenarchaeota'],
+    'Acidobacteria': ['acidobacteria'],
+    'Actinobacteria': ['actinobacteria'],  # Added Actinobacteria
+    'Aminicenantes': ['aminicenantes'],
+    'Alphaproteobacteria': ['alphaproteobacteria'],
+    'Deltaproteobacteria': ['deltaproteobacteria'],
+    'Gammaproteobacteria': ['gammaproteobacteria'],
+    'Anaerolineae': ['anaerolineae'],
+    'Dehalococcoidia': ['dehalococcoidia'],
+    'Other Chloroflexi': ['chloroflexi'],  # Special case handled separately
+    'Bacteroidetes': ['bacteroidetes'],
+    'Caldiserica': ['caldiserica'],
+    'Atribacteria': ['atribacteria'],
+    'Cyanobacteria/Chloroplast': ['cyanobacteria', 'chloroplast'],
+    'Firmicutes': ['firmicutes'],
+    'Nitrospirae': ['nitrospirae'],
+    'Planctomycetes': ['planctomycetes'],
+    'Rhodothermaeota': ['rhodothermaeota'],
+    'Spirochaetes': ['spirochaetes'],
+    'Verrucomicrobia': ['verrucomicrobia'],
+    'Woesearchaeota': ['woesearchaeota'],
+    'Euryarchaeota': ['euryarchaeota'],
+    'Candidatus Pacearchaeota': ['pacearchaeota']
+}
+
+# Custom colors for each taxonomic group using hex codes (reuse colors from the previous plot)
+taxonomic_colors = {
+    'Candidatus Bathyarchaeia': '#191970',
+    'Acidobacteria': '#7fffd4',
+    'Actinobacteria': '#228b22',  # Example color for Actinobacteria
+    'Aminicenantes': '#528b8b',
+    'Alphaproteobacteria': '#dda0dd',
+    'Deltaproteobacteria': '#ff0000',
+    'Gammaproteobacteria': '#ffc1c1',
+    'Anaerolineae': '#8b0000',
+    'Dehalococcoidia': '#c0ff3e',
+    'Other Chloroflexi': '#2f4f4f',
+    'Bacteroidetes': '#00ffff',
+    'Caldiserica': '#c1ffc1',
+    'Atribacteria': '#ff8c00',
+    'Cyanobacteria/Chloroplast': '#ffff00',
+    'Firmicutes': '#ffebcd',
+    'Nitrospirae': '#000000',
+    'Planctomycetes': '#473d8b',
+    'Rhodothermaeota': '#20b2aa',
+    'Spirochaetes': '#ff6a6a',
+    'Verrucomicrobia': '#c6e2ff',
+    'Woesearchaeota': '#9400d3',
+    'Euryarchaeota': '#ba2552',
+    'Candidatus Pacearchaeota': '#00ff00',  # Example color for Candidatus Pacearchaeota
+    'Others': '#808080'
+}
+
+
+def load_otu_table(input_file_path=OTU_TABLE_FILE):
+    """Read an OTU table, stripping whitespace from the column names in case of extra spaces."""
+    otu_df = pd.read_csv(input_file_path)
+    otu_df.columns = otu_df.columns.str.strip()
+    return otu_df
+
+
+def aggregate_otu_table(otu_df, classifier=None, groups=None):
+    """Sum the OTU abundances of each taxonomic group per sample, in the specified sample order.
+
+    ``groups`` may hold the taxonomic group of every OTU, as returned by ``classifier.classify``.
+    Tables of other cores, whose depths are not those of ``sample_order``, are ordered by depth.
+    """
+    # Columns with sample data, in depth order (the order of sample_order)
+    sample_columns = [col for col in otu_df.columns if '_cm' in col]
+    sample_columns_ordered = sorted(sample_columns, key=depth_of)
+
+    # Assign every OTU to its taxonomic group (first matching group wins, unmatched rows go to "Others")
+    # and sum the abundances of each group per sample
+    if classifier is None:
+        classifier = TaxonomyClassifier(taxonomic_groups)
+    abundance_df = classifier.aggregate(otu_df, sample_columns_ordered, groups)
+    abundance_df.columns = [sample.replace("_cm", "cm") for sample in sample_columns_ordered]
+    return abundance_df
+
+
+def plot_relative_abundance(abundance_df, pdf_path=OUTPUT_PDF_FILE, intervals=None):
+    """Stacked bar plot of the relative abundance of each taxonomic group by sample depth.
+
+    ``intervals`` may hold the (lower, upper) relative abundance bounds of every group
+    and sample (see resampling.bootstrap_relative_abundance), drawn as error bars at
+    the right end of each segment.
+    """
+    # matplotlib is only imported when a plot is drawn, aggregating the table does not need it
+    import matplotlib.pyplot as plt
+
+    # Normalize the abundance data to create a relative abundance plot
+    relative_abundance_df = abundance_df.div(abundance_df.sum(axis=0), axis=1)
+
+    # Plot settings
+    fig, ax = plt.subplots(figsize=(8, 10))
+
+    # Plotting the stacked bar chart
+    color_list = [taxonomic_colors[group] for group in relative_abundance_df.index]
+    relative_abundance_df.T.plot(kind='barh', stacked=True, ax=ax, color=color_list, edgecolor='none')
+
+    # Error bars around the right end of every segment
+    if intervals is not None:
+        lower, upper = (bound.reindex_like(relative_abundance_df) for bound in intervals)
+        ends = relative_abundance_df.cumsum(axis=0)
+        for group in relative_abundance_df.index:
+            value = relative_abundance_df.loc[group]
+            xerr = [(value - lower.loc[group]).clip(lower=0), (upper.loc[group] - value).clip(lower=0)]
+            ax.errorbar(ends.loc[group], range(len(ends.columns)), xerr=xerr, fmt='none', ecolor='black',
+                        elinewidth=0.6, capsize=1.5)
+
+    # Customize the plot
+    ax.set_xlabel('Relative Abundance')
+    ax.set_ylabel('Sample Depth (cm)')
+
+    # Set the correct y-tick positions and labels
+    ax.set_yticks(range(len(relative_abundance_df.columns)))  # Set the y-ticks to match the number of samples
+    ax.set_yticklabels(relative_abundance_df.columns)  # Set y-tick labels to the samples, in depth order
+
+    ax.invert_yaxis()  # To match the order in the image (top-down)
+    ax.set_title('Taxonomic Group Relative Abundance by Sample Depth')
+
+    # Create a legend
+    handles, labels = ax.get_legend_handles_labels()
+    ax.legend(handles, labels, title='Taxonomic group', bbox_to_anchor=(1.05, 1), loc='upper left', borderaxespad=0.)
+
+    # Save the plot to a PDF
+    plt.tight_layout()
+    plt.savefig(pdf_path, format='pdf')
+    return fig
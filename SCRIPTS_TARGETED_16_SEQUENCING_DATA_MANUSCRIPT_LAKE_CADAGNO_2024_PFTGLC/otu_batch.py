@@ -0,0 +1,117 @@
+import argparse
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from otu_barplot import aggregate_otu_table, load_otu_table, plot_relative_abundance, taxonomic_groups
+from taxonomy_classifier import TaxonomyClassifier
+
+# Combined long-format table of all the tables of a batch
+COMBINED_FILE = 'OTU_batch_combined_long.csv'
+
+# Columns of a manifest: the path of every table and an optional label; other columns are carried to the combined table
+PATH_COLUMN = 'path'
+LABEL_COLUMN = 'label'
+
+# Classifier of a worker process, received once when the worker starts
+_classifier = None
+
+
+def _init_worker(classifier):
+    global _classifier
+    _classifier = classifier
+
+
+def read_manifest(manifest_path):
+    """Tables listed in a manifest CSV (a ``path`` column, relative to the manifest, and optional metadata columns)."""
+    manifest = pd.read_csv(manifest_path, dtype=str)
+    if PATH_COLUMN not in manifest.columns:
+        raise ValueError(f"{manifest_path} has no '{PATH_COLUMN}' column")
+    folder = os.path.dirname(os.path.abspath(manifest_path))
+    manifest[PATH_COLUMN] = [os.path.join(folder, path) for path in manifest[PATH_COLUMN]]
+    return manifest
+
+
+def tables_from_patterns(patterns):
+    """Tables matching glob patterns, as a manifest without metadata."""
+    paths = sorted({path for pattern in patterns for path in glob.glob(pattern)})
+    return pd.DataFrame({PATH_COLUMN: paths})
+
+
+def _labelled(manifest):
+    # Every table is labelled, by default with its file name; labels name the outputs, so they must be unique
+    manifest = manifest.copy()
+    defaults = [os.path.splitext(os.path.basename(path))[0] for path in manifest[PATH_COLUMN]]
+    manifest[LABEL_COLUMN] = manifest[LABEL_COLUMN].fillna(pd.Series(defaults, index=manifest.index)) \
+        if LABEL_COLUMN in manifest.columns else defaults
+    duplicated = manifest[LABEL_COLUMN][manifest[LABEL_COLUMN].duplicated()]
+    if len(duplicated):
+        raise ValueError(f"duplicate table labels: {', '.join(sorted(set(duplicated)))}")
+    return manifest
+
+
+def process_table(path, label, output_dir, render=True):
+    """Job: classify and aggregate one OTU table, write its CSV (and PDF), and return the aggregated table."""
+    abundance_df = aggregate_otu_table(load_otu_table(path), _classifier)
+    abundance_df.to_csv(os.path.join(output_dir, f'{label}_aggregated_abundance.csv'))
+    if render:
+        import matplotlib.pyplot as plt
+        plt.close(plot_relative_abundance(abundance_df, os.path.join(output_dir, f'{label}_relative_abundance_plot.pdf')))
+    return abundance_df
+
+
+def long_format(abundance_df, metadata):
+    """One row per (group, sample) of an aggregated table: count and relative abundance, plus the table's metadata."""
+    long_df = abundance_df.rename_axis(index='group', columns='sample').stack().rename('count').reset_index()
+    totals = abundance_df.sum(axis=0)
+    long_df['relative_abundance'] = long_df['count'] / long_df['sample'].map(totals)
+    for position, (name, value) in enumerate(metadata.items()):
+        long_df.insert(position, name, value)
+    return long_df
+
+
+def run_batch(manifest, output_dir='.', workers=None, render=True):
+    """Aggregate every table of a manifest in a pool of worker processes and return the combined long table.
+
+    The classifier is compiled once and handed to every worker when it starts, not
+    with every table. Each table gets ``<label>_aggregated_abundance.csv`` (and, with
+    ``render``, ``<label>_relative_abundance_plot.pdf``); the combined table is
+    written to ``COMBINED_FILE``.
+    """
+    manifest = _labelled(manifest)
+    os.makedirs(output_dir, exist_ok=True)
+    classifier = TaxonomyClassifier(taxonomic_groups)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(classifier,)) as pool:
+        jobs = [pool.submit(process_table, row[PATH_COLUMN], row[LABEL_COLUMN], output_dir, render)
+                for _, row in manifest.iterrows()]
+        aggregated = [job.result() for job in jobs]
+
+    metadata_columns = [LABEL_COLUMN] + [column for column in manifest.columns if column not in (PATH_COLUMN, LABEL_COLUMN)]
+    parts = [long_format(abundance_df, row[metadata_columns])
+             for abundance_df, (_, row) in zip(aggregated, manifest.iterrows())]
+    combined = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+    combined.to_csv(os.path.join(output_dir, COMBINED_FILE), index=False)
+    return combined
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Aggregate several OTU tables (identity thresholds, cores) in parallel.')
+    parser.add_argument('patterns', nargs='*', help='glob patterns of OTU table CSVs')
+    parser.add_argument('--manifest', help="CSV listing the tables ('path', optional 'label' and metadata columns)")
+    parser.add_argument('--output-dir', default='otu_batch', help='folder for the per-table outputs and the combined table')
+    parser.add_argument('--workers', type=int, help='worker processes (default: one per core)')
+    parser.add_argument('--data-only', action='store_true', help='write the CSVs only, without the plots')
+    args = parser.parse_args()
+
+    if bool(args.patterns) == bool(args.manifest):
+        parser.error('give either glob patterns or --manifest')
+    manifest = read_manifest(args.manifest) if args.manifest else tables_from_patterns(args.patterns)
+    if manifest.empty:
+        parser.error('no OTU tables found')
+
+    combined = run_batch(manifest, args.output_dir, args.workers, not args.data_only)
+    print(f"{len(manifest)} tables aggregated, combined table of {len(combined)} rows saved to "
+          f"{os.path.join(args.output_dir, COMBINED_FILE)}")
@@ -0,0 +1,72 @@
+import re
+
+import pandas as pd
+
+# Lineage columns of the OTU table, from the highest rank down
+TAXONOMY_COLUMNS = ['taxonomy', 'a', 'b', 'c', 'd']
+
+# Groups that must not claim a lineage also matching one of these keywords
+# ("Other Chloroflexi" leaves Anaerolineae and Dehalococcoidia to their own groups)
+DEFAULT_EXCLUSIONS = {'Other Chloroflexi': ['anaerolineae', 'dehalococcoidia']}
+
+# Column separator (ASCII unit separator) used when joining a lineage into one string;
+# it is a non-word character, so whole-word keywords can never match across two columns
+_SEPARATOR = '\x1f'
+
+
+def _word_pattern(keywords):
+    # One case-insensitive whole-word pattern matching any of the keywords
+    return re.compile(r'\b(?:' + '|'.join(re.escape(keyword) for keyword in keywords) + r')\b', re.IGNORECASE)
+
+
+class TaxonomyClassifier:
+    """Assign OTU lineages to taxonomic groups by whole-word keyword matching.
+
+    Groups are tried in dictionary order and the first match wins; lineages
+    matching no group go to ``other_group``. The patterns are compiled once,
+    and only the distinct lineages of a table are matched against them.
+    """
+
+    def __init__(self, taxonomic_groups, exclusions=DEFAULT_EXCLUSIONS, other_group='Others'):
+        self.groups = list(taxonomic_groups)
+        self.other_group = other_group
+        self.patterns = [_word_pattern(keywords) for keywords in taxonomic_groups.values()]
+        self.exclusions = {group: _word_pattern(keywords) for group, keywords in exclusions.items()}
+
+    def classify_lineages(self, lineages):
+        """Return the group of every joined lineage string in ``lineages`` (a pandas Series)."""
+        assigned = pd.Series(self.other_group, index=lineages.index, dtype=object)
+        unassigned = pd.Series(True, index=lineages.index)
+        for group, pattern in zip(self.groups, self.patterns):
+            match = unassigned & lineages.str.contains(pattern)
+            if group in self.exclusions:
+                match &= ~lineages.str.contains(self.exclusions[group])
+            assigned[match] = group
+            unassigned &= ~match
+        return assigned
+
+    def classify(self, otu_df):
+        """Return the group of every OTU row, matching each distinct lineage only once."""
+        taxonomy = otu_df[TAXONOMY_COLUMNS]
+
+        # Number the distinct lineage tuples in order of appearance (missing ranks included)
+        codes = taxonomy.groupby(TAXONOMY_COLUMNS, dropna=False, sort=False).ngroup().to_numpy()
+        uniques = taxonomy.drop_duplicates()
+
+        # Join each distinct lineage the way str(row[col]) renders it, so missing ranks read 'nan'
+        lineages = uniques[TAXONOMY_COLUMNS[0]].map(str)
+        for column in TAXONOMY_COLUMNS[1:]:
+            lineages = lineages + _SEPARATOR + uniques[column].map(str)
+
+        lookup = self.classify_lineages(lineages.reset_index(drop=True)).to_numpy()
+        return pd.Series(lookup[codes], index=otu_df.index)
+
+    def aggregate(self, otu_df, sample_columns, groups=None):
+        """Sum the sample columns per group, with one row for every group plus the others group.
+
+        ``groups`` may hold the result of ``classify`` for this table, to skip classifying it again.
+        """
+        if groups is None:
+            groups = self.classify(otu_df)
+        summed = otu_df[sample_columns].groupby(groups).sum()
+        return summed.reindex(self.groups + [self.other_group], fill_value=0)
@@ -0,0 +1,150 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from otu_barplot import OTU_TABLE_FILE, load_otu_table
+from taxonomy_classifier import TAXONOMY_COLUMNS
+
+# Ranks of the lineage columns of the OTU table, from the highest down
+RANKS = dict(zip(['phylum', 'class', 'order', 'family', 'genus'], TAXONOMY_COLUMNS))
+
+# Column of the OTU table with the total count of each OTU (over more samples than the depth columns)
+SUM_COLUMN = 'Sum'
+
+# Separator of the lineage paths labelling the taxa
+PATH_SEPARATOR = ';'
+
+
+class TaxonomyRollup:
+    """OTU abundances as a sparse OTU x sample matrix, with an encoded lineage tree over the OTUs.
+
+    The OTU hashes are factorized into integer IDs (``otu_hashes[otu_ids[i]]`` is the
+    hash of the OTU of row ``i``) and the matrix is built from the non-zero counts of
+    each column, without a dense copy of the table. The ``Sum`` column travels with the sample columns as the last matrix column, so
+    every rollup sums it the same way as the samples. The taxa of a rank are the
+    distinct lineage prefixes down to that rank; each OTU holds the integer code of
+    its taxon at every rank. A rollup is one sparse product of a taxon x OTU
+    indicator with the matrix, and the indicators are kept, so switching ranks
+    never re-reads the table.
+    """
+
+    def __init__(self, otu_df, sample_columns=None):
+        if sample_columns is None:
+            sample_columns = [column for column in otu_df.columns if '_cm' in column]
+        self.sample_columns = list(sample_columns)
+        otu_ids, otu_hashes = pd.factorize(otu_df.iloc[:, 0].astype(str))
+        self.otu_ids = otu_ids.astype(np.int32)
+        self.otu_hashes = pd.Index(otu_hashes)
+
+        columns = self.sample_columns + ([SUM_COLUMN] if SUM_COLUMN in otu_df.columns else [])
+        self.columns = columns
+        self.matrix = self._sparse_counts(otu_df, columns)
+
+        # Lineage tree: the taxon code of every OTU at every rank, the path of every taxon
+        # and the code of its parent taxon at the rank above
+        self.taxon_codes = {}
+        self.taxon_paths = {}
+        self.taxon_parents = {}
+        paths = parent_codes = None
+        for rank, column in RANKS.items():
+            labels = otu_df[column].astype(object).fillna('unclassified').astype(str)
+            paths = labels if paths is None else paths + PATH_SEPARATOR + labels
+            codes, uniques = pd.factorize(paths, sort=True)
+            self.taxon_codes[rank] = codes.astype(np.int32)
+            self.taxon_paths[rank] = pd.Index(uniques)
+            parents = np.full(len(uniques), -1, dtype=np.int32)
+            if parent_codes is not None:
+                parents[codes] = parent_codes
+            self.taxon_parents[rank] = parents
+            parent_codes = codes
+        self._indicators = {}
+
+    @classmethod
+    def from_file(cls, path=OTU_TABLE_FILE):
+        return cls(load_otu_table(path))
+
+    @staticmethod
+    def _sparse_counts(otu_df, columns):
+        # Coordinates and values of the non-zero counts, one column at a time, assembled as COO;
+        # a missing count is a zero, as in the pandas sums of the figure scripts
+        rows, column_indices, counts = [], [], []
+        for j, column in enumerate(columns):
+            values = otu_df[column].fillna(0).to_numpy()
+            nonzero = np.flatnonzero(values)
+            rows.append(nonzero)
+            column_indices.append(np.full(len(nonzero), j))
+            counts.append(values[nonzero].astype(np.int64))
+        coordinates = (np.concatenate(rows), np.concatenate(column_indices))
+        return sparse.coo_matrix((np.concatenate(counts), coordinates), shape=(len(otu_df), len(columns))).tocsr()
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @property
+    def density(self):
+        """Fraction of non-zero OTU x column cells."""
+        return self.matrix.nnz / max(self.matrix.shape[0] * self.matrix.shape[1], 1)
+
+    def _indicator(self, codes, n_groups):
+        return sparse.csr_matrix((np.ones(len(codes), dtype=np.int64), (codes, np.arange(len(codes)))),
+                                 shape=(n_groups, len(codes)))
+
+    def _rollup(self, indicator, labels, with_sum):
+        summed = pd.DataFrame((indicator @ self.matrix).toarray(), index=labels, columns=self.columns)
+        return summed if with_sum else summed[self.sample_columns]
+
+    def aggregate(self, rank, with_sum=False):
+        """Taxon x sample sums at a rank ('phylum' ... 'genus', or the column name 'taxonomy' ... 'd').
+
+        Taxa are labelled by their lineage path ('Chloroflexi;Anaerolineae'), missing
+        ranks reading 'unclassified'. With ``with_sum`` the summed ``Sum`` column is kept.
+        """
+        rank = {column: name for name, column in RANKS.items()}.get(rank, rank)
+        if rank not in self._indicators:
+            self._indicators[rank] = self._indicator(self.taxon_codes[rank], len(self.taxon_paths[rank]))
+        return self._rollup(self._indicators[rank], self.taxon_paths[rank], with_sum)
+
+    def aggregate_groups(self, groups, order=None, with_sum=False):
+        """Sample sums of a custom grouping: ``groups`` holds one label per OTU (e.g. ``TaxonomyClassifier.classify``).
+
+        Rows follow ``order`` when given (absent groups get zeros), otherwise first appearance.
+        """
+        codes, uniques = pd.factorize(pd.Series(groups).to_numpy())
+        summed = self._rollup(self._indicator(codes, len(uniques)), pd.Index(uniques), with_sum)
+        return summed if order is None else summed.reindex(order, fill_value=0)
+
+    def check_sums(self, aggregate):
+        """Check that a rollup kept every count: its column totals must equal those of the OTU table.
+
+        With the ``Sum`` column kept, each taxon's ``Sum`` must also be at least its sample total,
+        as it is for every OTU. Raises ValueError otherwise.
+        """
+        totals = np.asarray(self.matrix.sum(axis=0)).ravel()
+        expected = pd.Series(totals, index=self.columns)[list(aggregate.columns)]
+        lost = aggregate.sum(axis=0) != expected
+        if lost.any():
+            raise ValueError(f"rollup does not preserve the totals of {', '.join(lost[lost].index)}")
+        if SUM_COLUMN in aggregate.columns:
+            short = aggregate[SUM_COLUMN] < aggregate[self.sample_columns].sum(axis=1)
+            if short.any():
+                raise ValueError(f"Sum is below the sample total for {', '.join(map(str, short[short].index))}")
+        return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Sum the OTU abundances per taxon at a rank of the lineage.')
+    parser.add_argument('rank', choices=list(RANKS) + TAXONOMY_COLUMNS, help='rank to aggregate at')
+    parser.add_argument('--input', default=OTU_TABLE_FILE, help='OTU table CSV')
+    parser.add_argument('--output', help='write the taxon x sample table to this CSV instead of printing it')
+    parser.add_argument('--with-sum', action='store_true', help='keep the summed Sum column')
+    args = parser.parse_args()
+
+    rollup = TaxonomyRollup.from_file(args.input)
+    aggregate = rollup.aggregate(args.rank, args.with_sum)
+    rollup.check_sums(aggregate)
+    if args.output:
+        aggregate.to_csv(args.output)
+    else:
+        print(aggregate.to_string())
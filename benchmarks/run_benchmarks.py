@@ -0,0 +1,180 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Render on a non-interactive backend, in this process and in every benchmark process
+os.environ['MPLBACKEND'] = 'Agg'
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+AMPLICON_DIR = os.path.join(REPO_DIR, 'SCRIPTS_TARGETED_16_SEQUENCING_DATA_MANUSCRIPT_LAKE_CADAGNO_2024_PFTGLC')
+sys.path[:0] = [os.path.join(REPO_DIR, 'SCRIPTS_METAGENOMIC_DATA_MANUSCRIPT_LAKE_CADAGNO_2024_PFTGLC'), AMPLICON_DIR,
+                os.path.join(REPO_DIR, 'common')]
+
+from figure_aggregators import FIGURE_AGGREGATORS  # noqa: E402
+from master_table_loader import load_master_table  # noqa: E402
+from normalization import marker_totals  # noqa: E402
+from otu_barplot import OTU_TABLE_FILE  # noqa: E402
+from stage_profiler import StageProfiler  # noqa: E402
+from synthetic_data import write_master_table, write_otu_table  # noqa: E402
+
+OTU_FIGURE = 'otu_97'
+STAGES = ['load', 'filter', 'aggregate', 'render']
+BASELINE_FILE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+
+
+def _benchmark_stages(profiler, stage_names):
+    # Benchmark stage -> wall time summed over its profiler stages, and the highest peak RSS of these stages
+    stages = {}
+    for stage, names in stage_names.items():
+        records = [profiler.records[name] for name in names if name in profiler.records]
+        stages[stage] = {'seconds': sum(record.wall_seconds for record in records),
+                         'peak_rss_mb': max((record.peak_rss_mb or 0.0 for record in records), default=0.0)}
+    return stages
+
+
+def _figure_peak(stages):
+    # Peak RSS of a figure: the highest of its stages
+    return max(measure['peak_rss_mb'] for measure in stages.values())
+
+
+def bench_metagenomic(name, master_table, output_dir):
+    """Benchmark one metagenomic figure; runs in a fresh process so its peak RSS is its own.
+
+    The figure goes through ``aggregate_figures`` and ``export_figure``, the calls of the
+    figure scripts (without the aggregate cache, so the aggregation is measured), and the
+    stages are read from their stage profiler.
+    """
+    import matplotlib.pyplot as plt
+    from figure_pipeline import aggregate_figures, export_figure
+
+    profiler = StageProfiler()
+    aggregator, = aggregate_figures([name], master_table, profiler=profiler, use_cache=False)
+    plt.close(export_figure(aggregator, output_dir, profiler))
+    return _benchmark_stages(profiler, {
+        'load': ['load'],
+        'filter': [f'{name}: filter'],
+        'aggregate': [f'{name}: aggregate', f'{name}: normalize'],
+        'render': [f'{name}: export CSV', f'{name}: render'],
+    })
+
+
+def bench_otu(otu_table, output_dir):
+    """Benchmark the 16S figure; runs in a fresh process so its peak RSS is its own."""
+    import matplotlib.pyplot as plt
+    from otu_barplot import aggregate_otu_table, load_otu_table, plot_relative_abundance, taxonomic_groups
+    from taxonomy_classifier import TaxonomyClassifier
+
+    profiler = StageProfiler()
+    with profiler.stage('load'):
+        otu_df = load_otu_table(otu_table)
+    with profiler.stage('filter'):
+        classifier = TaxonomyClassifier(taxonomic_groups)
+        groups = classifier.classify(otu_df)
+    with profiler.stage('aggregate'):
+        abundance_df = aggregate_otu_table(otu_df, classifier, groups)
+    with profiler.stage('render'):
+        plt.close(plot_relative_abundance(abundance_df, os.path.join(output_dir, 'OTU_97_relative_abundance_plot.pdf')))
+    return _benchmark_stages(profiler, {stage: [stage] for stage in STAGES})
+
+
+def run_benchmarks(rows, otu_rows, work_dir, figures=None, seed=0):
+    """Generate the synthetic tables and benchmark every figure pipeline, one fresh process per figure."""
+    figures = list(figures or list(FIGURE_AGGREGATORS) + [OTU_FIGURE])
+    os.makedirs(work_dir, exist_ok=True)
+    master_table = os.path.join(work_dir, f'synthetic_master_table_{rows}.csv')
+    otu_table = os.path.join(work_dir, f'synthetic_otu_table_{otu_rows}.csv')
+    if not os.path.exists(master_table):
+        write_master_table(master_table, rows, seed)
+    if not os.path.exists(otu_table):
+        write_otu_table(otu_table, otu_rows, seed, lineage_source=os.path.join(AMPLICON_DIR, OTU_TABLE_FILE))
+
+    # Build the Parquet cache and the marker totals once, so every figure loads the way a rerun does
+    results = {'rows': rows, 'otu_rows': otu_rows, 'figures': {}}
+    start = time.perf_counter()
+    load_master_table((), master_table)
+    marker_totals(master_table)
+    results['cache_build_seconds'] = time.perf_counter() - start
+
+    context = multiprocessing.get_context('spawn')
+    for name in figures:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            if name == OTU_FIGURE:
+                job = pool.submit(bench_otu, otu_table, work_dir)
+            else:
+                job = pool.submit(bench_metagenomic, name, master_table, work_dir)
+            results['figures'][name] = job.result()
+    return results
+
+
+def find_regressions(results, baseline, time_tolerance=0.25, memory_tolerance=0.25, min_seconds=0.05):
+    """List the stages slower, or figures heavier in peak RSS, than the baseline beyond the tolerances."""
+    regressions = []
+    for name, stages in results['figures'].items():
+        base_stages = baseline['figures'].get(name, {})
+        for stage, measure in stages.items():
+            base = base_stages.get(stage)
+            if base is None:
+                continue
+            slower = measure['seconds'] - base['seconds']
+            if slower > min_seconds and measure['seconds'] > base['seconds'] * (1 + time_tolerance):
+                regressions.append(f"{name}/{stage}: {measure['seconds']:.3f} s vs {base['seconds']:.3f} s")
+        if stages and base_stages:
+            peak, base_peak = _figure_peak(stages), _figure_peak(base_stages)
+            if peak > base_peak * (1 + memory_tolerance):
+                regressions.append(f"{name}/peak RSS: {peak:.0f} MB vs {base_peak:.0f} MB")
+    return regressions
+
+
+def print_results(results):
+    print(f"{results['rows']} master-table rows, {results['otu_rows']} OTU rows "
+          f"(cache build {results['cache_build_seconds']:.2f} s)")
+    print(f"{'figure':<12}" + ''.join(f'{stage + " (s)":>15}' for stage in STAGES) + f"{'peak RSS (MB)':>16}")
+    for name, stages in results['figures'].items():
+        print(f'{name:<12}' + ''.join(f"{stages[stage]['seconds']:>15.3f}" for stage in STAGES)
+              + f"{_figure_peak(stages):>16.0f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the figure pipelines on synthetic data.')
+    parser.add_argument('figures', nargs='*', help=f"figures to benchmark, among {', '.join(list(FIGURE_AGGREGATORS) + [OTU_FIGURE])} (default: all)")
+    parser.add_argument('--rows', type=int, default=100_000, help='rows of the synthetic master table (10k to 50M)')
+    parser.add_argument('--otu-rows', type=int, default=50_000, help='rows of the synthetic OTU table')
+    parser.add_argument('--work-dir', default=os.path.join(BENCHMARK_DIR, 'data'), help='folder for the synthetic tables and outputs')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='baseline results to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the new baseline')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    parser.add_argument('--time-tolerance', type=float, default=0.25, help='allowed relative slowdown per stage')
+    parser.add_argument('--memory-tolerance', type=float, default=0.25, help='allowed relative growth of peak RSS')
+    args = parser.parse_args()
+
+    unknown = [name for name in args.figures if name not in FIGURE_AGGREGATORS and name != OTU_FIGURE]
+    if unknown:
+        parser.error(f"unknown figures: {', '.join(unknown)}")
+
+    results = run_benchmarks(args.rows, args.otu_rows, args.work_dir, args.figures)
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+        print(f'Baseline saved to {args.baseline}')
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if (baseline['rows'], baseline['otu_rows']) != (results['rows'], results['otu_rows']):
+            print('Baseline was recorded for other table sizes, not comparing.')
+        else:
+            regressions = find_regressions(results, baseline, args.time_tolerance, args.memory_tolerance)
+            for regression in regressions:
+                print(f'REGRESSION {regression}')
+            if regressions:
+                sys.exit(1)
+            print('No regression against the baseline.')
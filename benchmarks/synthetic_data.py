@@ -0,0 +1,141 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(REPO_DIR, 'SCRIPTS_METAGENOMIC_DATA_MANUSCRIPT_LAKE_CADAGNO_2024_PFTGLC'),
+                os.path.join(REPO_DIR, 'SCRIPTS_TARGETED_16_SEQUENCING_DATA_MANUSCRIPT_LAKE_CADAGNO_2024_PFTGLC')]
+
+from figure_definitions import (CLUSTER_COLUMN, CLUSTER_GROUP_COLUMN, COG_COLUMN, FUNCTION_COLUMN,  # noqa: E402
+                                TAXONOMY_COLUMN, bathyarchaeia_color_map, cluster_order, cog_categories,
+                                group_colors, marker_genes, supercategories)
+from master_table_loader import DEPTH_COLUMNS  # noqa: E402
+from taxonomy_classifier import TAXONOMY_COLUMNS  # noqa: E402
+
+# Rows generated and written at a time, so any table size runs in bounded memory
+CHUNK_ROWS = 1_000_000
+
+# Lineages used when the real OTU table is not available (taxonomy, a, b, c, d)
+FALLBACK_LINEAGES = [
+    ('Crenarchaeota', 'Thermoprotei', 'Acidilobales', 'Caldisphaeraceae', 'Caldisphaera'),
+    ('Atribacteria', None, None, None, None),
+    ('Chloroflexi', 'Dehalococcoidia', 'Dehalococcoidales', None, None),
+    ('Chloroflexi', 'Anaerolineae', 'Anaerolineales', 'Anaerolineaceae', None),
+    ('Chloroflexi', 'Ardenticatenia', None, None, None),
+    ('Proteobacteria', 'Deltaproteobacteria', 'Syntrophobacterales', None, None),
+    ('Aminicenantes', None, None, None, None),
+    ('Euryarchaeota', 'Methanomicrobia', 'Methanosarcinales', None, None),
+    ('Planctomycetes', 'Phycisphaerae', None, None, None),
+    ('Bacteroidetes', 'Bacteroidia', 'Bacteroidales', None, None),
+    ('Unassigned', None, None, None, None),
+]
+
+
+def _weights(n, exponent=1.2):
+    # Zipf-like frequencies: a few values are very common, most are rare
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def _pick(rng, values, probabilities, n):
+    values = np.array(values, dtype=object)
+    return values[rng.choice(len(values), size=n, p=probabilities)]
+
+
+def _sparse_abundances(rng, n, n_columns, zero_fraction, mean_log, sigma):
+    # Coverage-like values: log-normal, with a share of exact zeros per cell
+    values = rng.lognormal(mean_log, sigma, size=(n, n_columns))
+    values[rng.random((n, n_columns)) < zero_fraction] = 0
+    return values
+
+
+def _master_chunk(rng, n, start):
+    # Functional annotation: mostly unannotated, ~1% RpS3 (some written 'rpS3'), rare marker genes
+    functions = ['RpS3', 'rpS3'] + list(marker_genes) + [f'hypothetical_{i}' for i in range(200)] + [None]
+    probabilities = np.concatenate([[0.009, 0.001], np.full(len(marker_genes), 0.0004),
+                                    _weights(200) * 0.2, [0.0]])
+    probabilities[-1] = 1 - probabilities.sum()
+
+    # BLAST taxonomy: the Figure 1B groups plus a long tail of other names, Zipf-distributed
+    taxa = [group for group in group_colors if group != 'Others'] + [f'Other lineage {i}' for i in range(50)] + [None]
+    taxa_probabilities = _weights(len(taxa))
+
+    # Bathyarchaeia clusters on ~3% of the rows, each cluster always in the same phylogenetic group
+    groups = list(bathyarchaeia_color_map)
+    cluster_group = {cluster: groups[i % len(groups)] for i, cluster in enumerate(cluster_order)}
+    clusters = np.where(rng.random(n) < 0.03, _pick(rng, cluster_order, _weights(len(cluster_order), 0.8), n), None)
+
+    # COG categories: single letters mostly, some multi-letter strings, '-' and missing values
+    letters = list(cog_categories) + [letter for data in supercategories.values() for letter in data['cogs']] + ['R', 'X']
+    cogs = _pick(rng, letters, _weights(len(letters), 0.7), n)
+    two_letters = rng.random(n) < 0.08
+    cogs[two_letters] = cogs[two_letters] + _pick(rng, letters, _weights(len(letters), 0.7), int(two_letters.sum()))
+    cogs[rng.random(n) < 0.15] = '-'
+    cogs[rng.random(n) < 0.10] = None
+
+    df = pd.DataFrame({
+        'ORF_ID': [f'SOL_1_{start + i}_N_{(start + i) % 9973}' for i in range(n)],
+        TAXONOMY_COLUMN: _pick(rng, taxa, taxa_probabilities, n),
+        FUNCTION_COLUMN: _pick(rng, functions, probabilities, n),
+        CLUSTER_COLUMN: clusters,
+        CLUSTER_GROUP_COLUMN: [cluster_group.get(cluster) for cluster in clusters],
+        COG_COLUMN: cogs,
+    })
+    abundances = _sparse_abundances(rng, n, len(DEPTH_COLUMNS), zero_fraction=0.4, mean_log=1.0, sigma=1.2)
+    df[DEPTH_COLUMNS] = np.round(abundances, 4)
+    return df
+
+
+def write_master_table(path, n_rows, seed=0, chunk_rows=CHUNK_ROWS):
+    """Write a synthetic master table of ``n_rows`` rows with the columns the figure scripts read."""
+    rng = np.random.default_rng(seed)
+    for start in range(0, n_rows, chunk_rows):
+        chunk = _master_chunk(rng, min(chunk_rows, n_rows - start), start)
+        chunk.to_csv(path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+    return path
+
+
+def _lineages(otu_table):
+    if otu_table and os.path.exists(otu_table):
+        df = pd.read_csv(otu_table, usecols=TAXONOMY_COLUMNS)
+        counts = df.value_counts(dropna=False)
+        return [tuple(None if pd.isna(v) else v for v in lineage) for lineage in counts.index], (counts / counts.sum()).to_numpy()
+    return FALLBACK_LINEAGES, _weights(len(FALLBACK_LINEAGES))
+
+
+def write_otu_table(path, n_rows, seed=0, lineage_source=None, chunk_rows=CHUNK_ROWS):
+    """Write a synthetic OTU table shaped like the 97% identity table of the 16S figure.
+
+    Lineages are drawn with the frequencies of ``lineage_source`` (a real OTU table)
+    when given, otherwise from a small built-in list.
+    """
+    rng = np.random.default_rng(seed)
+    lineages, probabilities = _lineages(lineage_source)
+    sample_columns = DEPTH_COLUMNS[::-1]
+    for start in range(0, n_rows, chunk_rows):
+        n = min(chunk_rows, n_rows - start)
+        counts = np.rint(_sparse_abundances(rng, n, len(sample_columns), zero_fraction=0.6, mean_log=2.0, sigma=2.0)).astype(np.int64)
+        chunk = pd.DataFrame(counts, columns=sample_columns)
+        chunk.insert(0, 'X', [f'{value:032x}' for value in rng.integers(0, 2 ** 63, size=n)])
+        chunk['Sum'] = counts.sum(axis=1)
+        picked = rng.choice(len(lineages), size=n, p=probabilities)
+        for k, column in enumerate(TAXONOMY_COLUMNS):
+            chunk[column] = [lineages[i][k] for i in picked]
+        chunk.to_csv(path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+    return path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write synthetic master and OTU tables for benchmarking.')
+    parser.add_argument('--rows', type=int, default=100_000, help='rows of the master table (10k to 50M)')
+    parser.add_argument('--otu-rows', type=int, default=50_000, help='rows of the OTU table')
+    parser.add_argument('--output-dir', default='.', help='folder for the generated tables')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    write_master_table(os.path.join(args.output_dir, 'synthetic_master_table.csv'), args.rows, args.seed)
+    write_otu_table(os.path.join(args.output_dir, 'synthetic_otu_table.csv'), args.otu_rows, args.seed)
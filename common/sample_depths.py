@@ -0,0 +1,12 @@
+import re
+
+# Sample labels of the scripts: '3_cm' (master table and OTU table columns), '3cm' and '3 cm' (plot labels)
+SAMPLE_LABEL_PATTERN = re.compile(r'\s*(\d+)\s*_?\s*cm\s*')
+
+
+def depth_of(label):
+    """Depth in cm of a sample label in any of the styles of the scripts ('3_cm', '3cm', '3 cm')."""
+    match = SAMPLE_LABEL_PATTERN.fullmatch(str(label))
+    if match is None:
+        raise ValueError(f"'{label}' is not a sample depth")
+    return int(match.group(1))
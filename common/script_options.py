@@ -0,0 +1,12 @@
+import os
+import sys
+
+# Write the summary CSVs only, without importing matplotlib, with this flag or environment variable
+DATA_ONLY_FLAG = '--data-only'
+DATA_ONLY_ENV_VARIABLE = 'FIGURE_DATA_ONLY'
+
+
+def data_only_requested(argv=None):
+    """Whether only the data was asked for, by the environment variable or by ``--data-only`` among the arguments."""
+    argv = sys.argv[1:] if argv is None else argv
+    return os.environ.get(DATA_ONLY_ENV_VARIABLE, '') not in ('', '0') or DATA_ONLY_FLAG in argv
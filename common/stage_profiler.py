@@ -0,0 +1,191 @@
+import json
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+# Profiling is switched on by setting this environment variable to 1, or by the --profile flag
+PROFILE_ENV_VARIABLE = 'FIGURE_PROFILE'
+PROFILE_FLAG = '--profile'
+
+
+def _rss_mb():
+    # Current resident set size, read from /proc where available
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError):
+        return None
+
+
+def _high_water_mb():
+    # High-water mark of the resident set size (VmHWM), which _reset_high_water lowers to the current size
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _reset_high_water():
+    # Writing 5 to clear_refs resets VmHWM (Linux), so the next reading is the peak since the reset
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB.
+
+    Lowered by the stage profiler on Linux, which resets the high-water mark at every
+    stage; ``StageProfiler.process_peak_rss_mb`` keeps the peak of the whole run.
+    """
+    # ru_maxrss is in kilobytes on Linux (bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def profiling_requested(argv=None):
+    """Whether profiling was asked for, by the environment variable or by ``--profile`` among the arguments."""
+    argv = sys.argv[1:] if argv is None else argv
+    return os.environ.get(PROFILE_ENV_VARIABLE, '') not in ('', '0') or PROFILE_FLAG in argv
+
+
+class StageRecord:
+    """Measurements of one named stage, summed over all the times the stage ran."""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.rss_delta_mb = 0.0
+        # Highest resident set size reached while the stage ran (None where it cannot be measured)
+        self.peak_rss_mb = None
+        self.rows_in = None
+        self.rows_out = None
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+class _Rows:
+    # Row counts of a single run of a stage, set by the code inside the stage
+    def __init__(self, rows_in=None):
+        self.rows_in = rows_in
+        self.rows_out = None
+
+
+class StageProfiler:
+    """Wall time, CPU time, memory and row counts of the named stages of a figure script.
+
+    Stages are timed with ``with profiler.stage('load') as stage:``; the code in the
+    block may set ``stage.rows_out`` (and ``stage.rows_in``). A stage run several
+    times, such as the per-batch filtering, is summed into one record. The peak RSS
+    of a stage is its own: the kernel's high-water mark is reset when the stage
+    starts and read when it ends (Linux only). When the profiler is disabled
+    ``stage`` returns a shared no-op context and nothing is measured or written.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.records = {}
+        self.started = time.perf_counter()
+        self.peak_mb = peak_rss_mb()
+        # Peaks of the stages currently running, innermost last
+        self._open_peaks = []
+
+    @classmethod
+    def from_command_line(cls, argv=None):
+        """A profiler enabled when ``profiling_requested``."""
+        return cls(profiling_requested(argv))
+
+    def stage(self, name, rows_in=None):
+        if not self.enabled:
+            return _DISABLED_STAGE
+        return self._measure(name, rows_in)
+
+    def _read_high_water(self):
+        # The peak since the last reset counts for every running stage and for the whole run
+        high_water = _high_water_mb()
+        if high_water is not None:
+            self.peak_mb = max(self.peak_mb, high_water)
+            for peak in self._open_peaks:
+                peak[0] = max(peak[0], high_water)
+
+    def process_peak_rss_mb(self):
+        """Peak resident set size of the whole run, in MB."""
+        self._read_high_water()
+        return max(self.peak_mb, peak_rss_mb())
+
+    @contextmanager
+    def _measure(self, name, rows_in):
+        rows = _Rows(rows_in)
+        self._read_high_water()
+        measured = _reset_high_water()
+        peak = [0.0]
+        self._open_peaks.append(peak)
+        rss_before = _rss_mb()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield rows
+        finally:
+            wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+            rss_after = _rss_mb()
+            self._read_high_water()
+            self._open_peaks = [open_peak for open_peak in self._open_peaks if open_peak is not peak]
+            record = self.records.setdefault(name, StageRecord(name))
+            record.calls += 1
+            record.wall_seconds += wall
+            record.cpu_seconds += cpu
+            if rss_before is not None and rss_after is not None:
+                record.rss_delta_mb += rss_after - rss_before
+            if measured:
+                record.peak_rss_mb = max(record.peak_rss_mb or 0.0, peak[0])
+            for key in ('rows_in', 'rows_out'):
+                if getattr(rows, key) is not None:
+                    setattr(record, key, (getattr(record, key) or 0) + getattr(rows, key))
+
+    def report(self):
+        return {
+            'script': os.path.basename(sys.argv[0]),
+            'total_wall_seconds': time.perf_counter() - self.started,
+            'peak_rss_mb': self.process_peak_rss_mb(),
+            'stages': [record.as_dict() for record in self.records.values()],
+        }
+
+    def write_report(self, path):
+        """Write the JSON report to ``path`` (nothing is written when disabled)."""
+        if not self.enabled:
+            return None
+        with open(path, 'w') as report_file:
+            json.dump(self.report(), report_file, indent=2)
+        print(f"Stage profile saved to {path}")
+        return path
+
+
+class _DisabledStage:
+    # Reusable no-op context: attribute writes are accepted and ignored
+    rows_in = rows_out = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def __setattr__(self, key, value):
+        pass
+
+
+_DISABLED_STAGE = _DisabledStage()
+
+# Profiler used when none is given
+DISABLED_PROFILER = StageProfiler(enabled=False)
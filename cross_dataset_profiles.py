@@ -0,0 +1,166 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+METAGENOMIC_DIR = os.path.join(REPO_DIR, 'SCRIPTS_METAGENOMIC_DATA_MANUSCRIPT_LAKE_CADAGNO_2024_PFTGLC')
+AMPLICON_DIR = os.path.join(REPO_DIR, 'SCRIPTS_TARGETED_16_SEQUENCING_DATA_MANUSCRIPT_LAKE_CADAGNO_2024_PFTGLC')
+sys.path[:0] = [METAGENOMIC_DIR, AMPLICON_DIR, os.path.join(REPO_DIR, 'common')]
+
+from figure_definitions import group_colors  # noqa: E402
+from master_table_loader import DEPTH_COLUMNS, MASTER_TABLE_FILE  # noqa: E402
+from otu_barplot import OTU_TABLE_FILE, taxonomic_groups  # noqa: E402
+from sample_depths import depth_of  # noqa: E402
+
+# Methods along the last axis of the cube
+METHODS = ['16S', 'metagenomic']
+
+# 16S group -> metagenomic (Figure 1B) group of the same lineage. The metagenomic names are the
+# canonical ones; 16S groups without a counterpart keep their own name and have no metagenomic profile
+TAXON_NAME_MAPPING = {
+    'Candidatus Bathyarchaeia': 'Candidatus Bathyarchaeia',
+    'Acidobacteria': 'Acidobacteria',
+    'Actinobacteria': 'Actinobacteria',
+    'Aminicenantes': 'Candidatus Aminicenantes',
+    'Alphaproteobacteria': 'Other Proteobacteria',
+    'Deltaproteobacteria': 'Deltaproteobacteria',
+    'Gammaproteobacteria': 'Other Proteobacteria',
+    'Anaerolineae': 'Anaerolineae',
+    'Dehalococcoidia': 'Dehalococcoidia',
+    'Other Chloroflexi': 'Other Chloroflexi',
+    'Bacteroidetes': 'Bacteroidetes',
+    'Atribacteria': 'Candidatus Atribacteria',
+    'Firmicutes': 'Firmicutes',
+    'Nitrospirae': 'Nitrospirae',
+    'Planctomycetes': 'Planctomycetes',
+    'Woesearchaeota': 'Candidatus Woesearchaeota',
+    'Euryarchaeota': 'Euryarchaeota',
+    'Others': 'Others',
+}
+
+# Depth registry: the canonical depths in cm, top to bottom, that every sample label is mapped to
+DEPTHS = [depth_of(column) for column in DEPTH_COLUMNS]
+
+
+def canonical_taxa():
+    """Taxa of the cube: the metagenomic groups in plotting order, then the 16S-only groups."""
+    only_16s = [group for group in list(taxonomic_groups) + ['Others'] if TAXON_NAME_MAPPING.get(group, group) not in group_colors]
+    return list(group_colors) + [TAXON_NAME_MAPPING.get(group, group) for group in only_16s]
+
+
+def _aligned(profile, taxa, depths, groups):
+    # Taxa x samples -> canonical depths x taxa array. A group of the method without reads at a measured depth
+    # (no row, or NaN where other groups have a value) is 0; taxa the method has no group for, and depths
+    # without any value, are NaN
+    columns = pd.Index([depth_of(column) for column in profile.columns])
+    unknown = columns.difference(depths)
+    if len(unknown):
+        raise ValueError(f"depths missing from the registry: {', '.join(map(str, unknown))}")
+    values = profile.set_axis(columns, axis=1).astype(float)
+    groups = pd.Index(groups).unique()
+    values = values.reindex(values.index.append(groups.difference(values.index)))
+    measured = values.columns[values.notna().any(axis=0)]
+    values.loc[groups, measured] = values.loc[groups, measured].fillna(0)
+    return values.reindex(index=taxa, columns=depths).to_numpy().T
+
+
+class DepthTaxonCube:
+    """Relative abundances of both datasets as one depths x taxa x methods array.
+
+    ``values[d, t, m]`` is the relative abundance of taxon ``taxa[t]`` at depth
+    ``depths[d]`` (cm) measured by method ``methods[m]`` (16S, metagenomic); it is
+    0 for a group of the method without reads, and NaN where a method has no group
+    for the taxon or no sample at the depth.
+    """
+
+    def __init__(self, values, depths, taxa, methods=METHODS):
+        self.values = values
+        self.depths = list(depths)
+        self.taxa = list(taxa)
+        self.methods = list(methods)
+
+    @classmethod
+    def from_profiles(cls, otu_abundance, metagenomic_profile, depths=DEPTHS, mapping=TAXON_NAME_MAPPING):
+        """Align a 16S group x sample count table (``OTU_97_aggregated_abundance``) and the Figure 1B profile.
+
+        The 16S groups are renamed (and summed where several map to one metagenomic
+        group) before being normalized by the total of every sample.
+        """
+        renamed = otu_abundance.groupby(otu_abundance.index.map(lambda group: mapping.get(group, group)), sort=False).sum()
+        relative = renamed.div(renamed.sum(axis=0), axis=1)
+        taxa = canonical_taxa()
+        taxa += [taxon for taxon in list(relative.index) + list(metagenomic_profile.index) if taxon not in taxa]
+        otu_groups = [mapping.get(group, group) for group in list(taxonomic_groups) + ['Others']]
+        values = np.stack([_aligned(relative, taxa, depths, otu_groups),
+                           _aligned(metagenomic_profile, taxa, depths, list(group_colors))], axis=2)
+        return cls(values, depths, taxa)
+
+    def to_frame(self):
+        """Long table: one row per depth and taxon, one column per method."""
+        index = pd.MultiIndex.from_product([self.depths, self.taxa], names=['depth_cm', 'taxon'])
+        return pd.DataFrame(self.values.reshape(-1, len(self.methods)), index=index, columns=self.methods)
+
+    def correlations(self, method='pearson'):
+        """Per-taxon correlation between the two methods over the depths where both have a value.
+
+        All taxa are correlated at once on the depth axis; ``method`` is 'pearson' or
+        'spearman' (Pearson on the ranks). Returns the correlation and the number of
+        depths used per taxon, NaN where fewer than three depths or no variation.
+        """
+        x, y = self.values[:, :, 0].copy(), self.values[:, :, 1].copy()
+        both = ~np.isnan(x) & ~np.isnan(y)
+        x[~both] = np.nan
+        y[~both] = np.nan
+        if method == 'spearman':
+            x = pd.DataFrame(x).rank(axis=0).to_numpy()
+            y = pd.DataFrame(y).rank(axis=0).to_numpy()
+        elif method != 'pearson':
+            raise ValueError(f"unknown method '{method}', expected pearson or spearman")
+
+        n = both.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            dx = np.where(both, x - np.where(both, x, 0).sum(axis=0) / n, 0)
+            dy = np.where(both, y - np.where(both, y, 0).sum(axis=0) / n, 0)
+            r = (dx * dy).sum(axis=0) / np.sqrt((dx ** 2).sum(axis=0) * (dy ** 2).sum(axis=0))
+        r = np.where(n >= 3, r, np.nan)
+        return pd.DataFrame({'correlation': r, 'n_depths': n}, index=pd.Index(self.taxa, name='taxon'))
+
+
+def otu_group_abundance(otu_table=None):
+    """16S group x sample counts, as written by 97_BARPLOT.py."""
+    from otu_barplot import aggregate_otu_table, load_otu_table
+
+    return aggregate_otu_table(load_otu_table(otu_table or os.path.join(AMPLICON_DIR, OTU_TABLE_FILE)))
+
+
+def metagenomic_group_profile(master_table=None):
+    """Figure 1B group x depth profile (RpS3 abundances normalized per sample), from the aggregate cache when possible."""
+    from figure_pipeline import figure_summary
+
+    return figure_summary('figure_1b', master_table or os.path.join(METAGENOMIC_DIR, MASTER_TABLE_FILE))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Join the 16S and metagenomic depth profiles and correlate them per taxon.')
+    parser.add_argument('--otu-table', help='OTU table CSV (default: the one next to 97_BARPLOT.py)')
+    parser.add_argument('--master-table', help='master table CSV (default: next to the metagenomic scripts)')
+    parser.add_argument('--otu-aggregate', help='use this OTU_97_aggregated_abundance CSV instead of aggregating the OTU table')
+    parser.add_argument('--profile', help='use this Figure 1B CSV instead of aggregating the master table')
+    parser.add_argument('--method', choices=['pearson', 'spearman'], default='pearson', help='correlation coefficient')
+    parser.add_argument('--output-prefix', default='cross_dataset', help='prefix of the output CSVs')
+    parser.add_argument('--mapping', help='write the 16S -> metagenomic name mapping to this CSV')
+    args = parser.parse_args()
+
+    otu_abundance = pd.read_csv(args.otu_aggregate, index_col=0) if args.otu_aggregate else otu_group_abundance(args.otu_table)
+    profile = pd.read_csv(args.profile, index_col=0) if args.profile else metagenomic_group_profile(args.master_table)
+
+    cube = DepthTaxonCube.from_profiles(otu_abundance, profile)
+    cube.to_frame().to_csv(f'{args.output_prefix}_depth_taxon_cube.csv')
+    cube.correlations(args.method).to_csv(f'{args.output_prefix}_correlations.csv')
+    if args.mapping:
+        pd.Series(TAXON_NAME_MAPPING, name='metagenomic_group').rename_axis('16S_group').to_csv(args.mapping)
+    print(f"Cube of {len(cube.depths)} depths x {len(cube.taxa)} taxa saved to {args.output_prefix}_depth_taxon_cube.csv, "
+          f"correlations to {args.output_prefix}_correlations.csv")
@@ -0,0 +1,120 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Render on a non-interactive backend, in this process and in every worker
+os.environ['MPLBACKEND'] = 'Agg'
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+METAGENOMIC_DIR = os.path.join(REPO_DIR, 'SCRIPTS_METAGENOMIC_DATA_MANUSCRIPT_LAKE_CADAGNO_2024_PFTGLC')
+AMPLICON_DIR = os.path.join(REPO_DIR, 'SCRIPTS_TARGETED_16_SEQUENCING_DATA_MANUSCRIPT_LAKE_CADAGNO_2024_PFTGLC')
+sys.path[:0] = [METAGENOMIC_DIR, AMPLICON_DIR]
+
+from figure_aggregators import FIGURE_AGGREGATORS  # noqa: E402
+from master_table_loader import MASTER_TABLE_FILE  # noqa: E402
+from otu_barplot import OTU_TABLE_FILE  # noqa: E402
+
+# Name of the 16S figure, next to the names of the metagenomic figures
+OTU_FIGURE = 'otu_97'
+
+
+def _save_png(fig, pdf_path, png_dpi, **savefig_kwargs):
+    if png_dpi:
+        fig.savefig(os.path.splitext(pdf_path)[0] + '.png', dpi=png_dpi, **savefig_kwargs)
+
+
+def aggregate_metagenomic(figures, master_table, streaming, use_cache):
+    """Job: aggregate the requested metagenomic figures in a single pass over the master table."""
+    from figure_pipeline import aggregate_figures
+
+    start = time.perf_counter()
+    aggregators = aggregate_figures(figures, master_table, streaming=streaming, use_cache=use_cache)
+    return aggregators, time.perf_counter() - start
+
+
+def render_metagenomic(aggregator, output_dir, png_dpi):
+    """Job: write the summary CSV and the PDF (and PNG) of one aggregated metagenomic figure."""
+    import matplotlib.pyplot as plt
+
+    start = time.perf_counter()
+    aggregator.write_csv(output_dir)
+    fig = aggregator.render(output_dir)
+    _save_png(fig, os.path.join(output_dir, aggregator.pdf_file), png_dpi, bbox_inches='tight')
+    plt.close(fig)
+    return time.perf_counter() - start
+
+
+def build_otu_figure(otu_table, output_dir, png_dpi):
+    """Job: aggregate the 16S OTU table, then write its CSV and PDF (and PNG)."""
+    import matplotlib.pyplot as plt
+    from otu_barplot import OUTPUT_CSV_FILE, OUTPUT_PDF_FILE, aggregate_otu_table, load_otu_table, plot_relative_abundance
+
+    start = time.perf_counter()
+    abundance_df = aggregate_otu_table(load_otu_table(otu_table))
+    aggregate_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    abundance_df.to_csv(os.path.join(output_dir, OUTPUT_CSV_FILE))
+    pdf_path = os.path.join(output_dir, OUTPUT_PDF_FILE)
+    fig = plot_relative_abundance(abundance_df, pdf_path)
+    _save_png(fig, pdf_path, png_dpi)
+    plt.close(fig)
+    return aggregate_time, time.perf_counter() - start
+
+
+def render_all(figures=None, master_table=None, otu_table=None, output_dir='figures', png_dpi=None,
+               workers=None, streaming=False, use_cache=True):
+    """Build the requested figures (default: all five) in a process pool and return their timings.
+
+    The metagenomic figures share one aggregation pass; their rendering jobs, and the
+    16S figure, run in parallel. Timings are (aggregation seconds, rendering seconds)
+    per figure, the shared pass being reported for every metagenomic figure.
+    """
+    figures = list(figures or list(FIGURE_AGGREGATORS) + [OTU_FIGURE])
+    master_table = master_table or os.path.join(METAGENOMIC_DIR, MASTER_TABLE_FILE)
+    otu_table = otu_table or os.path.join(AMPLICON_DIR, OTU_TABLE_FILE)
+    metagenomic = [name for name in figures if name in FIGURE_AGGREGATORS]
+    os.makedirs(output_dir, exist_ok=True)
+
+    timings = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        otu_job = pool.submit(build_otu_figure, otu_table, output_dir, png_dpi) if OTU_FIGURE in figures else None
+
+        if metagenomic:
+            aggregators, scan_time = pool.submit(aggregate_metagenomic, metagenomic, master_table, streaming, use_cache).result()
+            render_jobs = {aggregator.name: pool.submit(render_metagenomic, aggregator, output_dir, png_dpi)
+                           for aggregator in aggregators}
+            for name, job in render_jobs.items():
+                timings[name] = (scan_time, job.result())
+
+        if otu_job is not None:
+            timings[OTU_FIGURE] = otu_job.result()
+    return timings
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Render the figures of the manuscript headlessly, in parallel.')
+    parser.add_argument('figures', nargs='*', help=f"figures to build, among {', '.join(list(FIGURE_AGGREGATORS) + [OTU_FIGURE])} (default: all)")
+    parser.add_argument('--output-dir', default='figures', help='folder for the PDFs, PNGs and summary CSVs')
+    parser.add_argument('--png', type=int, metavar='DPI', help='also save every figure as PNG at this resolution')
+    parser.add_argument('--master-table', help='master table CSV (default: next to the metagenomic scripts)')
+    parser.add_argument('--otu-table', help='OTU table CSV (default: the one next to 97_BARPLOT.py)')
+    parser.add_argument('--workers', type=int, help='worker processes (default: one per core)')
+    parser.add_argument('--streaming', action='store_true', help='read the master table in chunks')
+    parser.add_argument('--no-cache', action='store_true', help='aggregate every figure again instead of reusing cached aggregates')
+    args = parser.parse_args()
+
+    unknown = [name for name in args.figures if name not in FIGURE_AGGREGATORS and name != OTU_FIGURE]
+    if unknown:
+        parser.error(f"unknown figures: {', '.join(unknown)}")
+
+    start = time.perf_counter()
+    timings = render_all(args.figures, args.master_table, args.otu_table, args.output_dir, args.png, args.workers, args.streaming,
+                         not args.no_cache)
+
+    print(f"{'figure':<12}{'aggregate (s)':>15}{'render (s)':>12}")
+    for name, (aggregate_time, render_time) in timings.items():
+        print(f"{name:<12}{aggregate_time:>15.2f}{render_time:>12.2f}")
+    print(f"Total wall time: {time.perf_counter() - start:.2f} s")
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+METAGENOMIC_DIR = os.path.join(REPO_DIR, 'SCRIPTS_METAGENOMIC_DATA_MANUSCRIPT_LAKE_CADAGNO_2024_PFTGLC')
+AMPLICON_DIR = os.path.join(REPO_DIR, 'SCRIPTS_TARGETED_16_SEQUENCING_DATA_MANUSCRIPT_LAKE_CADAGNO_2024_PFTGLC')
+sys.path[:0] = [METAGENOMIC_DIR, AMPLICON_DIR, os.path.join(REPO_DIR, 'common'), REPO_DIR]
+
+# Plots are drawn without a display
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+from master_table_loader import ANNOTATION_COLUMNS, DEPTH_COLUMNS  # noqa: E402
+
+
+@pytest.fixture
+def master_frame():
+    """A small master table: every annotation column, a few rows per group, some missing values."""
+    rng = np.random.default_rng(0)
+    n_rows = 60
+    frame = pd.DataFrame(rng.integers(0, 50, size=(n_rows, len(DEPTH_COLUMNS))).astype(float), columns=DEPTH_COLUMNS)
+    frame.iloc[::7, 2] = np.nan
+    frame[ANNOTATION_COLUMNS[0]] = rng.choice(['Bacteria;Chloroflexi;Anaerolineae', 'Archaea;Candidatus Bathyarchaeia',
+                                               'Bacteria;Firmicutes', None], n_rows)
+    frame[ANNOTATION_COLUMNS[1]] = rng.choice(['RpS3', 'McrA', 'DsrA', None], n_rows)
+    frame[ANNOTATION_COLUMNS[2]] = rng.choice(['Cluster 1', 'Cluster 2', None], n_rows)
+    frame[ANNOTATION_COLUMNS[3]] = rng.choice(['Subgroup 6', 'Subgroup 15', None], n_rows)
+    frame[ANNOTATION_COLUMNS[4]] = rng.choice(['C', 'E', 'J', None], n_rows)
+    return frame
+
+
+@pytest.fixture
+def master_table_file(master_frame, tmp_path):
+    """The small master table written as a CSV, in a folder of its own (caches are written next to it)."""
+    path = tmp_path / 'master_table.csv'
+    master_frame.to_csv(path, index=False)
+    return str(path)
@@ -0,0 +1,62 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from annotation_index import INDEXED_COLUMNS, AnnotationIndex, build_index, index_dir_for
+from figure_definitions import CLUSTER_COLUMN, FUNCTION_COLUMN, TAXONOMY_COLUMN
+from master_table_loader import DEPTH_COLUMNS
+
+
+@pytest.fixture
+def index(master_table_file):
+    return AnnotationIndex.open(master_table_file)
+
+
+@pytest.mark.parametrize('column', INDEXED_COLUMNS)
+def test_rows_match_pandas(index, master_frame, column):
+    for value in master_frame[column].dropna().unique():
+        np.testing.assert_array_equal(index.rows(column, value), np.flatnonzero(master_frame[column] == value))
+    assert len(index.rows(column, 'no such value')) == 0
+
+
+def test_profiles_match_pandas(index, master_frame):
+    values = ['RpS3', 'McrA', 'absent gene']
+    expected = master_frame.groupby(FUNCTION_COLUMN)[DEPTH_COLUMNS].sum().reindex(values, fill_value=0)
+    pd.testing.assert_frame_equal(index.profile(FUNCTION_COLUMN, values), expected, check_names=False)
+
+
+def test_substring_queries_ignore_case(index, master_frame):
+    assert index.matching_values(TAXONOMY_COLUMN, 'CHLOROFLEXI') == ['Bacteria;Chloroflexi;Anaerolineae']
+    profiles = index.profile_containing(CLUSTER_COLUMN, 'cluster')
+    expected = master_frame.groupby(CLUSTER_COLUMN)[DEPTH_COLUMNS].sum()
+    pd.testing.assert_frame_equal(profiles.sort_index(), expected, check_names=False)
+
+
+def test_edited_table_gets_a_new_index(master_frame, master_table_file):
+    folder = index_dir_for(master_table_file)
+    AnnotationIndex.open(master_table_file)
+    master_frame.iloc[:10].to_csv(master_table_file, index=False)
+    assert index_dir_for(master_table_file) != folder
+    assert len(AnnotationIndex.open(master_table_file).depths) == 10
+    # The index of the earlier table is removed
+    assert not os.path.exists(folder)
+
+
+def test_other_tables_keep_their_index(master_frame, master_table_file, tmp_path):
+    other_table = str(tmp_path / 'other_table.csv')
+    master_frame.iloc[:5].to_csv(other_table, index=False)
+    other_folder = build_index(other_table)
+    build_index(master_table_file)
+    master_frame.iloc[:10].to_csv(master_table_file, index=False)
+    build_index(master_table_file)
+    assert os.path.exists(other_folder)
+
+
+def test_concurrent_build_reuses_the_finished_index(master_frame, master_table_file):
+    folder = build_index(master_table_file)
+    # A second build of the same table finds the folder already in place
+    assert build_index(master_table_file) == folder
+    assert not [name for name in os.listdir(os.path.dirname(folder)) if name.endswith('.tmp')]
+    assert len(AnnotationIndex(folder).depths) == len(master_frame)
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from compact_table import CompactMasterTable
+from figure_definitions import COG_COLUMN, FUNCTION_COLUMN, TAXONOMY_COLUMN
+from master_table_loader import ANNOTATION_COLUMNS, DEPTH_COLUMNS
+
+
+@pytest.fixture
+def table(master_table_file):
+    return CompactMasterTable.load(ANNOTATION_COLUMNS, master_table_file, dtype=np.float64, chunksize=17)
+
+
+def test_load_matches_the_frame(table, master_frame):
+    assert len(table) == len(master_frame)
+    assert table.depths.dtype == np.float64 and table.depths.flags.c_contiguous
+    frame = table.to_frame()
+    np.testing.assert_array_equal(frame[DEPTH_COLUMNS].to_numpy(), master_frame[DEPTH_COLUMNS].to_numpy())
+    for column in ANNOTATION_COLUMNS:
+        assert frame[column].astype(object).where(frame[column].notna(), None).tolist() == \
+            master_frame[column].where(master_frame[column].notna(), None).tolist()
+
+
+def test_from_frame_is_float32_by_default(master_frame):
+    table = CompactMasterTable.from_frame(master_frame)
+    assert table.depths.dtype == np.float32
+    assert not table.depths.flags.writeable
+
+
+def test_to_frame_views_the_depth_matrix(table):
+    frame = table.to_frame(10, 20)
+    assert len(frame) == 10
+    assert np.shares_memory(table.depth_view(10, 20), table.depths)
+    assert np.shares_memory(frame[DEPTH_COLUMNS[0]].to_numpy(), table.depths)
+
+
+def test_masks_match_pandas(table, master_frame):
+    np.testing.assert_array_equal(table.isin(FUNCTION_COLUMN, ['RpS3', 'DsrA']),
+                                  master_frame[FUNCTION_COLUMN].isin(['RpS3', 'DsrA']).to_numpy())
+    np.testing.assert_array_equal(table.contains(TAXONOMY_COLUMN, 'chloroflexi'),
+                                  master_frame[TAXONOMY_COLUMN].str.contains('Chloroflexi', na=False).to_numpy(dtype=bool))
+
+
+def test_group_sums_match_pandas(table, master_frame):
+    mask = table.isin(FUNCTION_COLUMN, ['RpS3', 'McrA'])
+    expected = master_frame[mask].groupby(COG_COLUMN)[DEPTH_COLUMNS].sum()
+    pd.testing.assert_frame_equal(table.group_sums(COG_COLUMN, mask), expected, check_names=False)
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cross_dataset_profiles import DEPTHS, DepthTaxonCube
+from figure_definitions import group_colors
+from master_table_loader import DEPTH_COLUMNS
+from sample_depths import depth_of
+
+
+@pytest.mark.parametrize('label, depth', [('3_cm', 3), ('153cm', 153), (' 738 cm ', 738)])
+def test_depth_of_reads_every_label_style(label, depth):
+    assert depth_of(label) == depth
+
+
+@pytest.mark.parametrize('label', ['Sum', '3_mm', 'cm_3', '2.5_cm'])
+def test_depth_of_rejects_other_labels(label):
+    with pytest.raises(ValueError):
+        depth_of(label)
+
+
+@pytest.fixture
+def profiles():
+    """16S counts of two groups on the first ten depths ('3cm' labels), and a Figure 1B profile with groups
+    without reads left NaN, as the figure writes them."""
+    rng = np.random.default_rng(0)
+    otu_columns = [column.replace('_cm', 'cm') for column in DEPTH_COLUMNS[:10]]
+    otu_abundance = pd.DataFrame(rng.integers(1, 100, size=(3, 10)), columns=otu_columns,
+                                 index=['Aminicenantes', 'Acidobacteria', 'Others'])
+    profile = pd.DataFrame(np.nan, index=list(group_colors), columns=DEPTH_COLUMNS)
+    profile.loc[['Acidobacteria', 'Candidatus Aminicenantes', 'Others']] = rng.random((3, len(DEPTH_COLUMNS)))
+    return otu_abundance, profile
+
+
+def _values(cube, taxon, method):
+    return cube.values[:, cube.taxa.index(taxon), cube.methods.index(method)]
+
+
+def test_groups_without_reads_are_zero(profiles):
+    cube = DepthTaxonCube.from_profiles(*profiles)
+
+    # Defined by both methods, no reads in either
+    assert (_values(cube, 'Candidatus Woesearchaeota', 'metagenomic') == 0).all()
+    assert (_values(cube, 'Candidatus Woesearchaeota', '16S')[:10] == 0).all()
+    # Depths without a 16S sample stay NaN
+    assert np.isnan(_values(cube, 'Candidatus Woesearchaeota', '16S')[10:]).all()
+    # No 16S group maps to it
+    assert np.isnan(_values(cube, 'Candidatus Bipolaricaulota', '16S')).all()
+
+    correlations = cube.correlations()
+    assert correlations.loc['Candidatus Woesearchaeota', 'n_depths'] == 10
+    assert correlations.loc['Candidatus Bipolaricaulota', 'n_depths'] == 0
+
+
+def test_16s_groups_are_renamed_and_normalized(profiles):
+    otu_abundance, profile = profiles
+    cube = DepthTaxonCube.from_profiles(otu_abundance, profile)
+    expected = otu_abundance.loc['Aminicenantes'] / otu_abundance.sum(axis=0)
+    np.testing.assert_allclose(_values(cube, 'Candidatus Aminicenantes', '16S')[:10], expected)
+    assert cube.depths == DEPTHS
+    assert cube.to_frame().shape == (len(DEPTHS) * len(cube.taxa), 2)
+
+
+@pytest.mark.parametrize('method', ['pearson', 'spearman'])
+def test_correlations_match_pandas(profiles, method):
+    cube = DepthTaxonCube.from_profiles(*profiles)
+    correlations = cube.correlations(method)
+    frame = cube.to_frame()
+    for taxon in ['Acidobacteria', 'Candidatus Aminicenantes', 'Others']:
+        rows = frame.xs(taxon, level='taxon').dropna()
+        assert correlations.loc[taxon, 'n_depths'] == len(rows) == 10
+        assert correlations.loc[taxon, 'correlation'] == pytest.approx(rows['16S'].corr(rows['metagenomic'], method=method))
+
+
+def test_unknown_depths_are_rejected(profiles):
+    otu_abundance, profile = profiles
+    with pytest.raises(ValueError, match='registry'):
+        DepthTaxonCube.from_profiles(otu_abundance.rename(columns={'3cm': '5cm'}), profile)
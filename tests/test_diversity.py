@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.spatial.distance import pdist, squareform
+
+from diversity import alpha_diversity, depth_ordered, distance_matrix
+from master_table_loader import DEPTH_COLUMNS
+
+
+@pytest.fixture
+def abundance_df():
+    """Sparse taxa x sample counts, the samples out of depth order, with an absent taxon and a poorer last sample."""
+    rng = np.random.default_rng(0)
+    values = rng.integers(0, 30, size=(40, 6)) * (rng.random((40, 6)) < 0.6)
+    values[5] = 0
+    values[:20, 5] = 0
+    return pd.DataFrame(values, columns=['233_cm', '3_cm', '40_cm', '738_cm', '153_cm', '582_cm'])
+
+
+def test_samples_are_depth_ordered(abundance_df):
+    assert list(depth_ordered(abundance_df).columns) == [column for column in DEPTH_COLUMNS if column in abundance_df]
+
+
+@pytest.mark.parametrize('metric, presence', [('braycurtis', False), ('jaccard', True)])
+def test_distances_match_scipy(abundance_df, metric, presence):
+    values = depth_ordered(abundance_df).to_numpy().T
+    expected = squareform(pdist(values > 0 if presence else values, metric))
+    np.testing.assert_allclose(distance_matrix(abundance_df, metric).to_numpy(), expected, atol=1e-12)
+
+
+def test_bray_curtis_blocks_give_the_same_distances(abundance_df):
+    pd.testing.assert_frame_equal(distance_matrix(abundance_df, 'braycurtis', max_block_bytes=1),
+                                  distance_matrix(abundance_df, 'braycurtis'))
+
+
+def test_unknown_metric(abundance_df):
+    with pytest.raises(ValueError):
+        distance_matrix(abundance_df, 'euclidean')
+
+
+def test_alpha_diversity(abundance_df):
+    alpha = alpha_diversity(abundance_df)
+    for sample, counts in abundance_df.items():
+        p = counts[counts > 0] / counts.sum()
+        assert alpha.loc[sample, 'richness'] == (counts > 0).sum()
+        assert alpha.loc[sample, 'shannon'] == pytest.approx(-(p * np.log(p)).sum())
+        assert alpha.loc[sample, 'simpson'] == pytest.approx(1 - (p ** 2).sum())
+
+
+def test_empty_sample_has_no_indices():
+    alpha = alpha_diversity(pd.DataFrame({'3_cm': [0, 0], '40_cm': [1, 3]}))
+    assert alpha.loc['3_cm', 'richness'] == 0
+    assert np.isnan(alpha.loc['3_cm', ['shannon', 'simpson']].astype(float)).all()
@@ -0,0 +1,43 @@
+import os
+
+import pandas as pd
+import pytest
+
+from otu_barplot import OTU_TABLE_FILE, aggregate_otu_table, load_otu_table
+from otu_batch import COMBINED_FILE, read_manifest, run_batch
+from conftest import AMPLICON_DIR
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    """Two OTU tables cut from the 16S table, listed in a manifest with an identity column."""
+    otu_df = load_otu_table(os.path.join(AMPLICON_DIR, OTU_TABLE_FILE))
+    otu_df.iloc[:400].to_csv(tmp_path / 'first.csv', index=False)
+    otu_df.iloc[400:1000].to_csv(tmp_path / 'second.csv', index=False)
+    pd.DataFrame({'path': ['first.csv', 'second.csv'], 'identity': ['0.97', '0.99']}).to_csv(tmp_path / 'manifest.csv', index=False)
+    return read_manifest(tmp_path / 'manifest.csv')
+
+
+def test_batch_matches_single_tables(manifest, tmp_path):
+    output_dir = tmp_path / 'out'
+    combined = run_batch(manifest, output_dir, workers=1, render=False)
+
+    for label, path in zip(['first', 'second'], manifest['path']):
+        expected = aggregate_otu_table(load_otu_table(path))
+        written = pd.read_csv(output_dir / f'{label}_aggregated_abundance.csv', index_col=0)
+        pd.testing.assert_frame_equal(written, expected, check_dtype=False, check_names=False)
+
+        rows = combined[combined['label'] == label]
+        assert (rows['identity'] == ('0.97' if label == 'first' else '0.99')).all()
+        assert rows['count'].sum() == expected.to_numpy().sum()
+        totals = rows.groupby('sample')['relative_abundance'].sum()
+        assert totals.between(1 - 1e-9, 1 + 1e-9).all()
+
+    pd.testing.assert_frame_equal(pd.read_csv(output_dir / COMBINED_FILE, dtype={'identity': str}), combined,
+                                  check_dtype=False)
+
+
+def test_duplicate_labels_are_rejected(manifest, tmp_path):
+    manifest['label'] = 'same'
+    with pytest.raises(ValueError, match='duplicate'):
+        run_batch(manifest, tmp_path / 'out', workers=1, render=False)
@@ -0,0 +1,82 @@
+import os
+import shutil
+
+import pytest
+
+from conftest import REPO_DIR
+from protein_fasta import ProteinFasta, build_fasta_index, load_fasta_index, parse_headers
+
+SUPPLEMENTARY_FASTA = os.path.join(REPO_DIR, 'Supplementary_data', 'Supplementary_Data_1.faa')
+
+
+def naive_parse(path):
+    """ID -> sequence, reading the whole file line by line."""
+    sequences, name = {}, None
+    with open(path, newline='') as fasta_file:
+        for line in fasta_file:
+            line = line.rstrip('\r\n')
+            if line.startswith('>'):
+                name = line[1:].split()[0]
+                sequences[name] = ''
+            elif name is not None:
+                sequences[name] += line
+    return sequences
+
+
+def _write_wrapped(path, records, width, newline):
+    # Sequences wrapped at ``width`` residues, the last record without a final line break
+    with open(path, 'w', newline='') as fasta_file:
+        for i, (name, sequence) in enumerate(records):
+            lines = [f'>{name} description'] + [sequence[start:start + width] for start in range(0, len(sequence), width)]
+            fasta_file.write(newline.join(lines) + (newline if i < len(records) - 1 else ''))
+
+
+def test_fetch_matches_a_naive_parse(tmp_path):
+    path = tmp_path / 'proteins.faa'
+    shutil.copy(SUPPLEMENTARY_FASTA, path)
+    expected = naive_parse(path)
+    with ProteinFasta(str(path)) as fasta:
+        assert len(fasta) == len(expected)
+        for name, sequence in expected.items():
+            assert fasta.fetch(name) == sequence
+        assert list(fasta.fetch_many(list(expected)[:3])) == list(expected.values())[:3]
+
+
+@pytest.mark.parametrize('newline', ['\n', '\r\n'])
+def test_wrapped_records(tmp_path, newline):
+    records = [('SOL_1_10_cov_8.224951_N_5124', 'MKV' * 47), ('empty', ''), ('exact', 'A' * 120),
+               ('SOL_2_3_cov_1.5e2_N_7', 'W' * 61)]
+    path = tmp_path / 'wrapped.faa'
+    _write_wrapped(path, records, 60, newline)
+    assert naive_parse(path) == dict(records)
+    with ProteinFasta(str(path)) as fasta:
+        for name, sequence in records:
+            assert fasta.fetch(name) == sequence
+        assert 'missing' not in fasta
+        with pytest.raises(KeyError):
+            fasta.fetch('missing')
+        assert fasta.headers()['length'].tolist() == [len(sequence) for _, sequence in records]
+
+
+def test_index_is_rebuilt_when_the_fasta_changes(tmp_path):
+    path = tmp_path / 'proteins.faa'
+    _write_wrapped(path, [('a', 'MK')], 60, '\n')
+    assert load_fasta_index(str(path))['name'].tolist() == ['a']
+    _write_wrapped(path, [('a', 'MK'), ('b', 'W')], 60, '\n')
+    os.utime(path, (os.path.getmtime(path) + 10,) * 2)
+    assert load_fasta_index(str(path))['name'].tolist() == ['a', 'b']
+
+
+def test_parse_headers():
+    table = parse_headers(['SOL_1_10_cov_8.224951_N_5124', 'not an ORF'])
+    assert table.loc[0, ['sample', 'contig', 'coverage', 'orf']].tolist() == ['SOL_1', 10, 8.224951, 5124]
+    assert table.loc[1, ['sample', 'contig']].isna().all()
+
+
+@pytest.mark.parametrize('sequence_lines', [['MKV', 'MK', 'MKV'], ['MK', 'MKV'], ['MKV', 'MKV', '', 'M']])
+@pytest.mark.parametrize('newline', ['\n', '\r\n'])
+def test_irregular_line_widths_are_rejected(tmp_path, sequence_lines, newline):
+    path = tmp_path / 'irregular.faa'
+    path.write_bytes(newline.join(['>regular', 'MKV', 'MK', '>irregular'] + sequence_lines).encode() + newline.encode())
+    with pytest.raises(ValueError, match="'irregular'"):
+        build_fasta_index(str(path))
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from protein_statistics import AMBIGUOUS, AMINO_ACIDS, RESIDUE_CLASSES, STOP, sequence_features, summarize_by_sample
+from test_protein_fasta import _write_wrapped, naive_parse
+
+RECORDS = [('SOL_1_10_cov_2_N_1', 'MKVLAG*' * 20 + 'xbzj'), ('empty', ''),
+           ('SOL_1_11_cov_6_N_2', 'ACDEFGHIKLMNPQRSTVWY' * 3 + 'U'), ('SOL_2_3_cov_1.5e2_N_7', 'wy' * 31 + 'O-'),
+           ('unparsed', 'mkv*')]
+
+
+def naive_fractions(sequence):
+    """Residue class -> fraction of the sequence, counting one character at a time."""
+    counts = dict.fromkeys(RESIDUE_CLASSES, 0)
+    for residue in sequence.upper():
+        if residue in AMINO_ACIDS:
+            counts[residue] += 1
+        elif residue == STOP:
+            counts['stop'] += 1
+        elif residue in AMBIGUOUS:
+            counts['ambiguous'] += 1
+        else:
+            counts['other'] += 1
+    return {residue_class: count / len(sequence) if sequence else np.nan for residue_class, count in counts.items()}
+
+
+@pytest.fixture(params=['\n', '\r\n'], ids=['lf', 'crlf'])
+def fasta_path(tmp_path, request):
+    path = tmp_path / 'proteins.faa'
+    _write_wrapped(path, RECORDS, 60, request.param)
+    return str(path)
+
+
+@pytest.mark.parametrize('batch_records, workers', [(20_000, None), (2, None), (2, 2)])
+def test_features_match_a_per_character_count(fasta_path, batch_records, workers):
+    features = sequence_features(fasta_path, batch_records, workers)
+    sequences = naive_parse(fasta_path)
+    assert features['id'].tolist() == list(sequences)
+    assert features['length'].tolist() == [len(sequence) for sequence in sequences.values()]
+    for row, sequence in zip(features.itertuples(index=False), sequences.values()):
+        expected = naive_fractions(sequence)
+        for residue_class in RESIDUE_CLASSES:
+            assert getattr(row, f'frac_{residue_class}') == pytest.approx(expected[residue_class], nan_ok=True)
+
+
+def test_sample_summary_is_weighted_by_coverage(fasta_path):
+    features = sequence_features(fasta_path)
+    summary = summarize_by_sample(features)
+    assert summary.index.tolist() == ['SOL_1', 'SOL_2']
+    assert summary['n_sequences'].tolist() == [2, 1]
+    assert summary['total_coverage'].tolist() == [8, 150]
+
+    first, second = naive_fractions(RECORDS[0][1]), naive_fractions(RECORDS[2][1])
+    assert summary.loc['SOL_1', 'length'] == pytest.approx((2 * len(RECORDS[0][1]) + 6 * len(RECORDS[2][1])) / 8)
+    for residue_class in RESIDUE_CLASSES:
+        expected = (2 * first[residue_class] + 6 * second[residue_class]) / 8
+        assert summary.loc['SOL_1', f'frac_{residue_class}'] == pytest.approx(expected)
+    # A sample with a single sequence keeps its values
+    fraction_columns = [f'frac_{residue_class}' for residue_class in RESIDUE_CLASSES]
+    pd.testing.assert_series_equal(summary.loc['SOL_2', fraction_columns], features.loc[3, fraction_columns],
+                                   check_names=False, check_dtype=False)
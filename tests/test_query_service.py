@@ -0,0 +1,102 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from compact_table import CompactMasterTable
+from figure_definitions import COG_COLUMN, FUNCTION_COLUMN, TAXONOMY_COLUMN
+from master_table_loader import DEPTH_COLUMNS
+from query_service import QueryEngine, serve
+
+
+@pytest.fixture
+def engine(master_frame):
+    return QueryEngine(CompactMasterTable.from_frame(master_frame, dtype=np.float64))
+
+
+@pytest.fixture
+def server(engine):
+    server = serve(engine, port=0, quiet=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def _request(url, body=None):
+    data = body if body is None or isinstance(body, bytes) else json.dumps(body).encode()
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data)) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as error:
+        return error.code, json.loads(error.read())
+
+
+def test_aggregate_matches_pandas(engine, master_frame):
+    result = engine.aggregate(COG_COLUMN, filters={FUNCTION_COLUMN: ['RpS3', 'McrA']})
+    rows = master_frame[master_frame[FUNCTION_COLUMN].isin(['RpS3', 'McrA'])]
+    expected = rows.groupby(COG_COLUMN)[DEPTH_COLUMNS].sum()
+    pd.testing.assert_frame_equal(result.sort_index(), expected, check_names=False)
+
+
+def test_query_wraps_a_single_filter_value(engine):
+    single = engine.query({'group_by': COG_COLUMN, 'filters': {FUNCTION_COLUMN: 'RpS3'}})
+    listed = engine.query({'group_by': COG_COLUMN, 'filters': {FUNCTION_COLUMN: ['RpS3']}})
+    assert single == listed
+    assert engine.cache.hits == 1
+
+
+@pytest.mark.parametrize('query', [
+    {'group_by': COG_COLUMN, 'filters': {FUNCTION_COLUMN: 3}},
+    {'group_by': COG_COLUMN, 'filters': {FUNCTION_COLUMN: ['RpS3', 3]}},
+    {'group_by': COG_COLUMN, 'filters': ['RpS3']},
+    {'group_by': COG_COLUMN, 'contains': {TAXONOMY_COLUMN: ['Bathy']}},
+    {'group_by': ['COG_category']},
+    {'filters': {}},
+    {'group_by': COG_COLUMN, 'normalize': 'median'},
+    {'group_by': 'no_such_column'},
+])
+def test_query_rejects_malformed_queries(engine, query):
+    with pytest.raises(ValueError):
+        engine.query(query)
+
+
+def test_normalized_query_is_json_safe(engine):
+    answer = engine.query({'group_by': TAXONOMY_COLUMN, 'normalize': 'RpS3'})
+    assert answer['columns'] == DEPTH_COLUMNS
+    assert len(answer['data']) == len(answer['index'])
+    json.dumps(answer, allow_nan=False)
+
+
+def test_http_answers(server):
+    status, answer = _request(f'{server}/aggregate?group_by={COG_COLUMN}&{FUNCTION_COLUMN}=RpS3')
+    assert status == 200 and answer['columns'] == DEPTH_COLUMNS
+    status, answer = _request(f'{server}/aggregate', {'group_by': COG_COLUMN, 'contains': {TAXONOMY_COLUMN: 'bathy'}})
+    assert status == 200
+    status, columns = _request(f'{server}/columns')
+    assert status == 200 and set(columns) >= {COG_COLUMN, FUNCTION_COLUMN}
+
+
+@pytest.mark.parametrize('path, body', [
+    ('/aggregate', b'{not json'),
+    ('/aggregate', {'group_by': COG_COLUMN, 'filters': {FUNCTION_COLUMN: 3}}),
+    ('/aggregate', {'group_by': 'no_such_column'}),
+    ('/aggregate', {'group_by': COG_COLUMN, 'normalize': 'median'}),
+    ('/aggregate', ['not', 'an', 'object']),
+    ('/values?column=no_such_column', None),
+    ('/figure/no_such_figure', None),
+])
+def test_http_bad_requests(server, path, body):
+    status, answer = _request(server + path, body)
+    assert status == 400
+    assert 'error' in answer
+
+
+def test_http_unknown_endpoint(server):
+    status, _ = _request(f'{server}/nothing')
+    assert status == 404
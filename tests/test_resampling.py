@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.special import gammaln
+
+from figure_definitions import marker_genes
+from master_table_loader import DEPTH_COLUMNS
+from resampling import bootstrap_marker_genes, bootstrap_relative_abundance, rarefaction_curves
+
+
+@pytest.fixture
+def counts_df():
+    """OTU x sample counts with many rare OTUs and a few abundant ones."""
+    rng = np.random.default_rng(0)
+    counts = rng.negative_binomial(0.3, 0.05, size=(150, 3))
+    counts[:3] += 500
+    return pd.DataFrame(counts, columns=['3_cm', '40_cm', '153_cm'])
+
+
+def expected_richness(counts, depth):
+    # Hurlbert's rarefaction: sum over the OTUs of 1 - C(N - c, d) / C(N, d)
+    counts = counts[counts > 0]
+    total = counts.sum()
+    log_absent = (gammaln(total - counts + 1) - gammaln(total - counts - depth + 1)
+                  - gammaln(total + 1) + gammaln(total - depth + 1))
+    return (1 - np.exp(np.where(total - counts >= depth, log_absent, -np.inf))).sum()
+
+
+def test_rarefaction_mean_is_the_expected_richness(counts_df):
+    depths = [10, 100, 500, 1000]
+    mean, std = rarefaction_curves(counts_df, depths, n_iterations=2000, seed=1)
+    for sample, counts in counts_df.items():
+        for depth in depths:
+            standard_error = max(std.loc[depth, sample], 0.05) / np.sqrt(2000)
+            assert mean.loc[depth, sample] == pytest.approx(expected_richness(counts.to_numpy(), depth), abs=5 * standard_error)
+
+
+def test_rarefaction_at_and_beyond_the_sample_size(counts_df):
+    total = counts_df['3_cm'].sum()
+    mean, std = rarefaction_curves(counts_df[['3_cm']], [total, total + 1], n_iterations=50)
+    assert mean.loc[total, '3_cm'] == (counts_df['3_cm'] > 0).sum()
+    assert std.loc[total, '3_cm'] == 0
+    assert np.isnan(mean.loc[total + 1, '3_cm'])
+
+
+def test_rarefaction_depends_on_the_seed_only(counts_df):
+    single = rarefaction_curves(counts_df, n_iterations=300, seed=3)
+    parallel = rarefaction_curves(counts_df, n_iterations=300, seed=3, workers=2)
+    other_seed = rarefaction_curves(counts_df, n_iterations=300, seed=4)
+    for table, same in zip(single, parallel):
+        pd.testing.assert_frame_equal(table, same)
+    assert not single[0].equals(other_seed[0])
+
+
+def test_bootstrap_relative_abundance(counts_df):
+    lower, upper = bootstrap_relative_abundance(counts_df, n_iterations=500, seed=2)
+    same_lower, _ = bootstrap_relative_abundance(counts_df, n_iterations=500, seed=2, workers=2)
+    pd.testing.assert_frame_equal(lower, same_lower)
+    relative = counts_df / counts_df.sum(axis=0)
+    assert lower.shape == upper.shape == counts_df.shape
+    assert (lower <= upper).all().all()
+    # The abundant OTUs sit well inside their intervals
+    assert ((lower.iloc[:3] < relative.iloc[:3]) & (relative.iloc[:3] < upper.iloc[:3])).all().all()
+
+
+def test_bootstrap_marker_genes(master_table_file):
+    lower, upper = bootstrap_marker_genes(master_table_file, n_iterations=300, seed=0)
+    same_lower, _ = bootstrap_marker_genes(master_table_file, n_iterations=300, seed=0, workers=2)
+    pd.testing.assert_frame_equal(lower, same_lower)
+    assert list(lower.index) == list(marker_genes) and list(lower.columns) == DEPTH_COLUMNS
+    present = lower.notna() & upper.notna()
+    assert present.loc[['McrA', 'DsrA']].all().all()
+    assert (lower[present] <= upper[present]).all().all()
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from stage_profiler import StageProfiler, _reset_high_water
+
+
+@pytest.mark.skipif(not _reset_high_water(), reason='per-stage peaks are measured on Linux only')
+def test_each_stage_reports_its_own_peak():
+    profiler = StageProfiler()
+    with profiler.stage('allocate'):
+        block = np.ones(200 * 1024 ** 2 // 8)
+        del block
+    with profiler.stage('idle'):
+        pass
+    allocate, idle = profiler.records['allocate'], profiler.records['idle']
+    assert allocate.peak_rss_mb - idle.peak_rss_mb > 150
+    assert profiler.report()['peak_rss_mb'] >= allocate.peak_rss_mb
+
+
+@pytest.mark.skipif(not _reset_high_water(), reason='per-stage peaks are measured on Linux only')
+def test_a_stage_keeps_the_peak_of_the_stages_inside_it():
+    profiler = StageProfiler()
+    with profiler.stage('outer'):
+        with profiler.stage('inner'):
+            block = np.ones(200 * 1024 ** 2 // 8)
+            del block
+    assert profiler.records['outer'].peak_rss_mb >= profiler.records['inner'].peak_rss_mb
+
+
+def test_disabled_profiler_measures_nothing():
+    profiler = StageProfiler(enabled=False)
+    with profiler.stage('load') as stage:
+        stage.rows_out = 3
+    assert profiler.records == {}
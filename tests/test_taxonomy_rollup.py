@@ -0,0 +1,76 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import AMPLICON_DIR
+from otu_barplot import OTU_TABLE_FILE, load_otu_table, taxonomic_groups
+from taxonomy_classifier import TAXONOMY_COLUMNS, TaxonomyClassifier
+from taxonomy_rollup import PATH_SEPARATOR, RANKS, SUM_COLUMN, TaxonomyRollup
+
+
+@pytest.fixture(scope='module')
+def otu_df():
+    return load_otu_table(os.path.join(AMPLICON_DIR, OTU_TABLE_FILE))
+
+
+@pytest.fixture(scope='module')
+def rollup(otu_df):
+    return TaxonomyRollup(otu_df)
+
+
+def _lineage_paths(otu_df, rank):
+    # Lineage path of every OTU down to the rank, missing ranks reading 'unclassified'
+    columns = TAXONOMY_COLUMNS[:TAXONOMY_COLUMNS.index(RANKS[rank]) + 1]
+    labels = otu_df[columns].astype(object).fillna('unclassified').astype(str)
+    return labels.agg(PATH_SEPARATOR.join, axis=1)
+
+
+@pytest.mark.parametrize('rank', list(RANKS))
+def test_rank_rollup_matches_a_pandas_groupby(otu_df, rollup, rank):
+    columns = rollup.sample_columns + [SUM_COLUMN]
+    expected = otu_df[columns].groupby(_lineage_paths(otu_df, rank)).sum()
+    aggregate = rollup.aggregate(rank, with_sum=True)
+    pd.testing.assert_frame_equal(aggregate, expected, check_dtype=False, check_names=False)
+    assert rollup.check_sums(aggregate)
+
+
+def test_rank_can_be_given_by_its_column(rollup):
+    pd.testing.assert_frame_equal(rollup.aggregate(RANKS['class']), rollup.aggregate('class'))
+
+
+def test_groups_match_the_classifier(otu_df, rollup):
+    classifier = TaxonomyClassifier(taxonomic_groups)
+    groups = classifier.classify(otu_df)
+    order = classifier.groups + [classifier.other_group]
+    expected = classifier.aggregate(otu_df, rollup.sample_columns, groups)
+    pd.testing.assert_frame_equal(rollup.aggregate_groups(groups, order), expected, check_dtype=False,
+                                  check_names=False)
+
+
+def test_missing_counts_are_zeros(otu_df):
+    with_gaps = otu_df.iloc[:50].copy()
+    sample = [column for column in with_gaps.columns if '_cm' in column][0]
+    with_gaps[sample] = with_gaps[sample].astype(float)
+    with_gaps.iloc[::3, with_gaps.columns.get_loc(sample)] = np.nan
+
+    aggregate = TaxonomyRollup(with_gaps).aggregate('phylum')
+    expected = with_gaps[sample].groupby(with_gaps['taxonomy'].fillna('unclassified')).sum()
+    np.testing.assert_array_equal(aggregate[sample].to_numpy(), expected.to_numpy())
+
+
+def test_lost_counts_fail_the_check(rollup):
+    aggregate = rollup.aggregate('order')
+    aggregate.iloc[0, 0] -= 1
+    with pytest.raises(ValueError, match=f'preserve the totals of {aggregate.columns[0]}'):
+        rollup.check_sums(aggregate)
+
+
+def test_sum_below_the_sample_total_fails_the_check(rollup):
+    aggregate = rollup.aggregate('phylum', with_sum=True)
+    # Move counts from the Sum of one taxon to another: the totals hold, the first taxon is short
+    aggregate.iloc[0, aggregate.columns.get_loc(SUM_COLUMN)] -= 10 ** 9
+    aggregate.iloc[1, aggregate.columns.get_loc(SUM_COLUMN)] += 10 ** 9
+    with pytest.raises(ValueError, match=f'Sum is below the sample total for {aggregate.index[0]}'):
+        rollup.check_sums(aggregate)